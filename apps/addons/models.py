@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import collections
+import hashlib
 import itertools
 import json
 import os
@@ -47,7 +48,7 @@ from translations.fields import (LinkifiedField, PurifiedField, save_signal,
 from translations.query import order_by_translation
 from users.models import UserForeignKey, UserProfile
 from versions.compare import version_int
-from versions.models import Version
+from versions.models import ApplicationsVersions, Version
 
 from . import query, signals
 
@@ -795,6 +796,16 @@ class Addon(amo.models.OnChangeMixin, amo.models.ModelBase):
         log.info('Incrementing d2c-versions namespace for add-on [%s]: %s' % (
                  self.id, key))
 
+    def invalidate_update_rdf(self):
+        """Invalidates the services/update.py responses for this add-on.
+
+        Call this when there is an event that may change what update is
+        offered, the namespace key is shared with `services.update`.
+        """
+        if self.guid:
+            guid = hashlib.md5(self.guid.encode('utf-8')).hexdigest()
+            cache_ns_key('update-rdf:%s' % guid, increment=True)
+
     @property
     def current_version(self):
         "Returns the current_version field or updates it if needed."
@@ -2345,6 +2356,33 @@ models.signals.post_delete.connect(update_incompatible_versions,
                                    dispatch_uid='cor_update_incompatible')
 
 
+def invalidate_update_rdf(sender, instance, **kw):
+    """Clear the cached update RDF when something it was built from changes.
+    """
+    if kw.get('raw'):
+        return
+    try:
+        if isinstance(instance, Addon):
+            addon = instance
+        elif isinstance(instance, Version):
+            addon = instance.addon
+        else:
+            addon = instance.version.addon
+    except ObjectDoesNotExist:
+        return
+    addon.invalidate_update_rdf()
+
+
+for _sender in (Addon, Version, File, ApplicationsVersions,
+                IncompatibleVersions):
+    models.signals.post_save.connect(
+        invalidate_update_rdf, sender=_sender,
+        dispatch_uid='update_rdf_save_%s' % _sender.__name__.lower())
+    models.signals.post_delete.connect(
+        invalidate_update_rdf, sender=_sender,
+        dispatch_uid='update_rdf_delete_%s' % _sender.__name__.lower())
+
+
 # webapps.models imports addons.models to get Addon, so we need to keep the
 # Webapp import down here.
 from mkt.webapps.models import Webapp
@@ -101,18 +101,13 @@ def extract(addon):
     if addon.status == amo.STATUS_PUBLIC and 'boost' in d:
         d['_boost'] = max(d['_boost'], 1) * 4
 
-    # Indices for each language. languages is a list of locales we want to
-    # index with analyzer if the string's locale matches.
-    for analyzer, languages in amo.SEARCH_ANALYZER_MAP.iteritems():
-        d['name_' + analyzer] = list(
-            set(string for locale, string in translations[addon.name_id]
-                if locale.lower() in languages))
-        d['summary_' + analyzer] = list(
-            set(string for locale, string in translations[addon.summary_id]
-                if locale.lower() in languages))
-        d['description_' + analyzer] = list(
-            set(string for locale, string in translations[addon.description_id]
-                if locale.lower() in languages))
+    # Indices for each language, the strings of each field are indexed with
+    # the analyzer of their locale.
+    for field, id_ in (('name', addon.name_id), ('summary', addon.summary_id),
+                       ('description', addon.description_id)):
+        analyzed = amo.search.analyze_translations(translations[id_])
+        for analyzer, strings in analyzed.iteritems():
+            d['%s_%s' % (field, analyzer)] = strings
 
     return d
 
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import json
+import os
+import tempfile
 from StringIO import StringIO
 
 from django.conf import settings
@@ -133,3 +135,50 @@ class TestThemeUpdate(amo.tests.TestCase):
 
         self.check_good(
             json.loads(self.get_update('en-US', 813, 'src=gp').get_json()))
+
+    @mock.patch.object(theme_update.ThemeUpdate, 'icon_mtime')
+    @mock.patch.object(theme_update.ThemeUpdate, 'build_json')
+    @mock.patch.object(theme_update.ThemeUpdate, 'get_modified')
+    def test_get_json_cached(self, get_modified, build_json, icon_mtime):
+        get_modified.return_value = 1234
+        icon_mtime.return_value = 1000.0
+        build_json.return_value = '{}'
+        eq_(self.get_update('en-US', 15663).get_json(), '{}')
+        eq_(self.get_update('en-US', 15663).get_json(), '{}')
+        eq_(build_json.call_count, 1)
+
+        # A different locale, source or modified time isn't cached.
+        self.get_update('fr', 15663).get_json()
+        self.get_update('en-US', 15663, 'src=gp').get_json()
+        get_modified.return_value = 1235
+        self.get_update('en-US', 15663).get_json()
+        eq_(build_json.call_count, 4)
+
+        # Nor is a replaced icon.
+        icon_mtime.return_value = 1001.0
+        self.get_update('en-US', 15663).get_json()
+        eq_(build_json.call_count, 5)
+
+    @mock.patch.object(theme_update.ThemeUpdate, 'build_json')
+    @mock.patch.object(theme_update.ThemeUpdate, 'get_modified')
+    def test_get_json_not_found(self, get_modified, build_json):
+        get_modified.return_value = None
+        eq_(self.get_update('en-US', 999).get_json(), None)
+        assert not build_json.called
+
+    @mock.patch.object(theme_update.ThemeUpdate, 'icon_path')
+    def test_base64_icon_cached(self, icon_path):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, 'icon')
+        os.close(fd)
+        icon_path.return_value = path
+        try:
+            update = self.get_update('en-US', 15663)
+            eq_(update.base64_icon(15663), 'aWNvbg==')
+            with mock.patch('__builtin__.open') as open_:
+                eq_(update.base64_icon(15663), 'aWNvbg==')
+                assert not open_.called
+            eq_(update.icon_mtime(), os.stat(path).st_mtime)
+        finally:
+            os.unlink(path)
+        eq_(update.icon_mtime(), None)
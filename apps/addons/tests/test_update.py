@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime, timedelta
 from email import utils
+import time
 
+from django.core.cache import cache
 from django.db import connection
 
+import mock
 from nose.tools import eq_
 
 import amo
@@ -13,6 +16,8 @@ from addons.models import (Addon, CompatOverride, CompatOverrideRange,
 from applications.models import Application, AppVersion
 from files.models import File
 from services import update
+from services.utils import get_driver, on_checkin, on_checkout
+from services.update_index import UpdateIndex
 import settings_local
 from versions.models import ApplicationsVersions, Version
 
@@ -135,14 +140,18 @@ class TestLookup(amo.tests.TestCase):
         # Allow version to be optional.
         if args[0]:
             data['version'] = args[0]
-        up = update.Update(data)
-        up.cursor = connection.cursor()
+        up = self.make_update(data)
         assert up.is_valid()
         up.data['version_int'] = args[1]
         up.get_update()
         return (up.data['row'].get('version_id'),
                 up.data['row'].get('file_id'))
 
+    def make_update(self, data):
+        up = update.Update(data)
+        up.cursor = connection.cursor()
+        return up
+
     def change_status(self, version, status):
         version = Version.objects.get(pk=version)
         file = version.files.all()[0]
@@ -424,20 +433,24 @@ class TestDefaultToCompat(amo.tests.TestCase):
         default.update(kw)
         CompatOverrideRange.objects.create(**default)
 
+    def make_update(self, data):
+        up = update.Update(data)
+        up.cursor = connection.cursor()
+        return up
+
     def update_files(self, **kw):
         for version in self.addon.versions.all():
             for file in version.files.all():
                 file.update(**kw)
 
     def get(self, **kw):
-        up = update.Update({
+        up = self.make_update({
             'reqVersion': 1,
             'id': self.addon.guid,
             'version': kw.get('item_version', '1.0'),
             'appID': self.app.guid,
             'appVersion': kw.get('app_version', '3.0'),
         })
-        up.cursor = connection.cursor()
         assert up.is_valid()
         up.compat_mode = kw.get('compat_mode', 'strict')
         up.get_update()
@@ -563,6 +576,102 @@ class TestDefaultToCompat(amo.tests.TestCase):
         self.check(self.expected)
 
 
+def make_indexed_update(data):
+    index = UpdateIndex(None)
+    index.refresh(connection.cursor())
+    return update.Update(data, index=index)
+
+
+class TestLookupIndex(TestLookup):
+    """Runs the lookup tests against the in-process `UpdateIndex`."""
+
+    def make_update(self, data):
+        return make_indexed_update(data)
+
+
+class TestDefaultToCompatIndex(TestDefaultToCompat):
+    """Runs the compat tests against the in-process `UpdateIndex`."""
+
+    def make_update(self, data):
+        return make_indexed_update(data)
+
+
+class TestUpdateIndex(amo.tests.TestCase):
+    fixtures = ['base/addon_3615',
+                'base/platforms']
+
+    def setUp(self):
+        self.addon = Addon.objects.get(pk=3615)
+        self.index = UpdateIndex(None)
+        self.index.refresh(connection.cursor())
+
+    def test_get_addon(self):
+        eq_(self.index.get_addon(self.addon.guid),
+            (self.addon.pk, self.addon.status, self.addon.type,
+             self.addon.guid))
+        eq_(self.index.get_addon('garbage'), None)
+
+    def test_inactive(self):
+        self.addon.update(disabled_by_user=True)
+        self.index.refresh(connection.cursor(), full=True)
+        eq_(self.index.get_addon(self.addon.guid), None)
+
+    def test_incremental(self):
+        self.index.since = datetime.now() - timedelta(minutes=1)
+        self.addon.update(status=amo.STATUS_DELETED, modified=datetime.now())
+        self.index.refresh(connection.cursor())
+        eq_(self.index.get_addon(self.addon.guid), None)
+
+    def test_incremental_swaps_tables(self):
+        old = self.index.tables
+        self.index.since = datetime.now() - timedelta(minutes=1)
+        self.addon.update(status=amo.STATUS_DELETED, modified=datetime.now())
+        self.index.refresh(connection.cursor())
+        assert self.index.tables is not old
+        assert self.addon.guid in old[0]
+
+    @mock.patch.object(UpdateIndex, 'refresh')
+    def test_maybe_refresh_fresh(self, refresh):
+        self.index.refreshed = self.index.rebuilt = time.time()
+        self.index.maybe_refresh()
+        assert not refresh.called
+
+    @mock.patch.object(UpdateIndex, 'refresh')
+    def test_maybe_refresh_in_progress(self, refresh):
+        self.index.refreshed = 0
+        self.index._lock.acquire()
+        try:
+            self.index.maybe_refresh()
+        finally:
+            self.index._lock.release()
+        assert not refresh.called
+
+    @mock.patch('services.update_index.threading.Thread')
+    def test_maybe_refresh_background(self, thread):
+        self.index.refreshed = 0
+        self.index.maybe_refresh()
+        eq_(thread.call_args[1]['args'], (False,))
+        assert thread.return_value.start.called
+        assert self.index._lock.locked()
+        self.index._lock.release()
+
+    @mock.patch('services.update_index.threading.Thread')
+    def test_first_load_in_background(self, thread):
+        index = UpdateIndex(None)
+        index.maybe_refresh()
+        eq_(thread.call_args[1]['args'], (True,))
+        assert not index.loaded
+
+    @mock.patch.object(UpdateIndex, 'maybe_refresh')
+    def test_sql_until_loaded(self, maybe_refresh):
+        with mock.patch.object(settings_local, 'SERVICES_UPDATE_INDEX', True,
+                               create=True):
+            with mock.patch.object(update, '_index', UpdateIndex(None)):
+                eq_(update.get_index(), None)
+            with mock.patch.object(update, '_index', self.index):
+                eq_(update.get_index(), self.index)
+
+
 class TestResponse(amo.tests.TestCase):
     fixtures = ['base/addon_3615',
                 'base/platforms',
@@ -793,3 +902,93 @@ class TestResponse(amo.tests.TestCase):
         data['appVersion'] = '5.0.1'
         upd = self.get(data)
         eq_(upd.get_rdf(), upd.get_no_updates_rdf())
+
+
+class TestCachedResponse(amo.tests.TestCase):
+    fixtures = ['base/addon_3615',
+                'base/platforms']
+
+    def setUp(self):
+        self.good_data = {
+            'id': '{2fa4ed95-0317-4c6a-a74c-5f3e3912c1f9}',
+            'version': '2.0.58',
+            'reqVersion': 1,
+            'appID': '{ec8030f7-c20a-464f-9b0e-13a3a9e97384}',
+            'appVersion': '3.7a1pre',
+        }
+        self.old_cache = getattr(settings_local, 'SERVICES_UPDATE_CACHE',
+                                 False)
+        settings_local.SERVICES_UPDATE_CACHE = True
+        update.local_cache.clear()
+
+    def tearDown(self):
+        settings_local.SERVICES_UPDATE_CACHE = self.old_cache
+        update.local_cache.clear()
+
+    def get(self, data=None):
+        up = update.Update(data or self.good_data)
+        up.cursor = connection.cursor()
+        return up
+
+    def test_cached(self):
+        up = self.get()
+        rdf = update.get_cached_rdf(up)
+        assert 'em:updateLink' in rdf
+        up = self.get()
+        up.get_rdf = lambda: 'rendered'
+        eq_(update.get_cached_rdf(up), rdf)
+
+    def test_key_normalizes_os(self):
+        data = dict(self.good_data, appOS='something %s penguin' %
+                    amo.PLATFORM_LINUX.api_name)
+        other = dict(self.good_data, appOS=amo.PLATFORM_LINUX.api_name)
+        eq_(update.get_cache_key(data, 'strict'),
+            update.get_cache_key(other, 'strict'))
+        assert (update.get_cache_key(data, 'strict') !=
+                update.get_cache_key(data, 'normal'))
+
+    def test_invalidated_on_file_change(self):
+        rdf = update.get_cached_rdf(self.get())
+        update.local_cache.clear()
+        File.objects.get(pk=67442).update(status=amo.STATUS_DISABLED)
+        new = update.get_cached_rdf(self.get())
+        assert rdf != new
+        assert 'em:updateLink' not in new
+
+    def test_unknown_guid_not_cached(self):
+        data = dict(self.good_data, id='not a guid\x00\n' + 'x' * 300)
+        rdf = update.get_cached_rdf(self.get(data))
+        eq_(rdf, update.bad_rdf)
+        eq_(cache.get(update.get_cache_ns_key(data['id'])), None)
+        eq_(update.local_cache.get(update.get_cache_key(data, 'strict')),
+            None)
+
+    def test_ns_key_hashes_guid(self):
+        key = update.get_cache_ns_key(self.good_data['id'])
+        assert self.good_data['id'] not in key
+        eq_(key, update.get_cache_ns_key(unicode(self.good_data['id'])))
+
+
+class TestServicesPool(amo.tests.TestCase):
+
+    def test_driver(self):
+        import MySQLdb
+        import pymysql
+        eq_(get_driver(), MySQLdb)
+        with mock.patch.object(settings_local, 'SERVICES_DATABASE_DRIVER',
+                               'pymysql', create=True):
+            eq_(get_driver(), pymysql)
+
+    @mock.patch('services.utils.statsd')
+    def test_checkout_timing(self, statsd):
+        record = mock.Mock(info={})
+        on_checkout(None, record, None)
+        assert 'checkout_time' in record.info
+        on_checkin(None, record)
+        eq_(record.info, {})
+        eq_(statsd.timing.call_args[0][0], 'services.db.pool.checked_out')
+
+    @mock.patch('services.utils.statsd')
+    def test_checkin_without_checkout(self, statsd):
+        on_checkin(None, mock.Mock(info={}))
+        assert not statsd.timing.called
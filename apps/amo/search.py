@@ -9,6 +9,8 @@ from elasticutils.contrib.django import get_es as eu_get_es
 from pyes import ES as pyes_ES
 from pyes import VERSION as PYES_VERSION
 
+from constants.search import SEARCH_ANALYZER_MAP, SEARCH_LANGUAGE_TO_ANALYZER
+
 
 log = logging.getLogger('z.es')
 
@@ -19,6 +21,21 @@ DEFAULT_INDEXES = ['default']
 DEFAULT_DUMP_CURL = None
 
 
+def analyze_translations(translations):
+    """
+    Sort (locale, string) translations by the analyzer of their locale, in
+    one pass. Returns a dict of every analyzer in SEARCH_ANALYZER_MAP to the
+    distinct strings it should index.
+    """
+    analyzed = dict((analyzer, set()) for analyzer in SEARCH_ANALYZER_MAP)
+    for locale, string in translations:
+        analyzer = SEARCH_LANGUAGE_TO_ANALYZER.get(locale.lower())
+        if analyzer:
+            analyzed[analyzer].add(string)
+    return dict((analyzer, list(strings))
+                for analyzer, strings in analyzed.iteritems())
+
+
 # Pulled from elasticutils 0.5 so we can upgrade elasticutils to a newer
 # version which is based on pyelasticsearch and not break AMO.
 def get_es(hosts=None, default_indexes=None, timeout=None, dump_curl=None,
@@ -1,9 +1,12 @@
+import mock
+from nose.tools import eq_
+from  pyquery import PyQuery as pq
+
 import amo
 import amo.tests
+from services import pfs
 from services.pfs import get_output
 
-from  pyquery import PyQuery as pq
-
 
 class TestPfs(amo.tests.TestCase):
 
@@ -14,3 +17,49 @@ class TestPfs(amo.tests.TestCase):
                   'licenseURL', 'needsRestart']:
             res = get_output({k: 'fooo<script>alert("foo")</script>;'})
             assert not pq(res)('script')
+
+    def get(self, **kw):
+        data = {'mimetype': 'application/x-shockwave-flash',
+                'appID': '{ec8030f7-c20a-464f-9b0e-13a3a9e97384}',
+                'appVersion': '20.0', 'clientOS': 'Windows NT 6.1',
+                'chromeLocale': 'en-US'}
+        data.update(kw)
+        return get_output(data)
+
+    def test_plugin(self):
+        res = self.get()
+        assert '<pfs:name>Adobe Flash Player</pfs:name>' in res
+        assert ('<pfs:guid>{4cfaef8a-a6c9-41a0-8e6f-967eb8f49143}</pfs:guid>'
+                in res)
+
+    def test_variant(self):
+        res = self.get(clientOS='Linux x86_64')
+        assert '<pfs:name>Adobe Flash Player</pfs:name>' in res
+        assert '<pfs:guid>-1</pfs:guid>' in res
+        res = self.get(mimetype='application/x-director',
+                       chromeLocale='ja-JP')
+        assert 'eula_shockwaveplayer_jp' in res
+
+    def test_regex_mimetype(self):
+        res = self.get(mimetype='video/x-ms-wmv')
+        assert '<pfs:name>Windows Media Player</pfs:name>' in res
+        res = self.get(mimetype='video/x-ms-wmv',
+                       clientOS='Intel Mac OS X 10.8')
+        assert '<pfs:name>Flip4Mac</pfs:name>' in res
+        res = self.get(mimetype='video/x-ms-wmv', clientOS='Linux x86_64')
+        assert '<pfs:name>-1</pfs:name>' in res
+
+    def test_missing_required(self):
+        res = get_output({'mimetype': 'application/pdf'})
+        assert '<pfs:name>-1</pfs:name>' in res
+
+    @mock.patch('services.pfs.render_output')
+    def test_cached(self, render_output):
+        pfs.output_cache.clear()
+        render_output.return_value = '<RDF/>'
+        data = {'mimetype': 'application/pdf', 'clientOS': 'Win'}
+        get_output(data)
+        get_output(dict(data, appVersion='1.0'))
+        eq_(render_output.call_count, 1)
+        get_output(dict(data, clientOS='Linux'))
+        eq_(render_output.call_count, 2)
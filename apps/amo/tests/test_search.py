@@ -392,3 +392,16 @@ class TestPaginator(amo.tests.ESTestCase):
         eq_(p._count, None)
         p.page(1)
         eq_(p.count, Addon.search().count())
+
+
+class TestAnalyzeTranslations(amo.tests.TestCase):
+
+    def test_analyze(self):
+        analyzed = amo.search.analyze_translations([
+            ('en-US', 'Hello'), ('fr', 'Bonjour'), ('FR', 'Bonjour'),
+            ('ja', 'Konnichiwa'), ('ko', 'Annyeong'), ('pl', 'Dzien dobry')])
+        eq_(sorted(analyzed), sorted(amo.SEARCH_ANALYZER_MAP))
+        eq_(analyzed['english'], ['Hello'])
+        eq_(analyzed['french'], ['Bonjour'])
+        eq_(sorted(analyzed['cjk']), ['Annyeong', 'Konnichiwa'])
+        eq_(analyzed['german'], [])
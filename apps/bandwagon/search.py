@@ -1,6 +1,6 @@
 from operator import attrgetter
 
-import amo
+from amo.search import analyze_translations
 
 
 def extract(collection):
@@ -23,15 +23,12 @@ def extract(collection):
     if collection.listed:
         d['_boost'] = max(d['_boost'], 1) * 4
 
-    # Indices for each language. languages is a list of locales we want to
-    # index with analyzer if the string's locale matches.
-    for analyzer, languages in amo.SEARCH_ANALYZER_MAP.iteritems():
-        d['name_' + analyzer] = list(
-            set(string for locale, string in translations[collection.name_id]
-                if locale.lower() in languages))
-        d['description_' + analyzer] = list(
-            set(string for locale, string
-                in translations[collection.description_id]
-                if locale.lower() in languages))
+    # Indices for each language, the strings of each field are indexed with
+    # the analyzer of their locale.
+    for field, id_ in (('name', collection.name_id),
+                       ('description', collection.description_id)):
+        analyzed = analyze_translations(translations[id_])
+        for analyzer, strings in analyzed.iteritems():
+            d['%s_%s' % (field, analyzer)] = strings
 
     return d
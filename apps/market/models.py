@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import time
+import uuid
+
+from django.conf import settings
 from django.core.cache import cache
 from django.db import connection, models
 from django.dispatch import receiver
@@ -19,6 +23,7 @@ from constants.payments import (CARRIER_CHOICES, PAYMENT_METHOD_ALL,
                                 PROVIDER_CHOICES)
 from mkt.constants import apps
 from mkt.constants.regions import WORLDWIDE
+from mkt.receipts.cache import purchase_key
 from stats.models import Contribution
 from users.models import UserProfile
 
@@ -39,10 +44,6 @@ def price_key(data):
 
 class PriceManager(amo.models.ManagerBase):
 
-    def get_query_set(self):
-        qs = super(PriceManager, self).get_query_set()
-        return qs.transform(Price.transformer)
-
     def active(self):
         return self.filter(active=True).order_by('price')
 
@@ -71,13 +72,6 @@ class Price(amo.models.ModelBase):
     def __unicode__(self):
         return u'$%s' % self.price
 
-    @staticmethod
-    def transformer(prices):
-        # There are a constrained number of price currencies, let's just
-        # get them all.
-        Price._currencies = dict((price_key(model_to_dict(p)), p)
-                                 for p in PriceCurrency.objects.all())
-
     def get_price_data(self, carrier=None, region=None, provider=None):
         """
         Returns a tuple of Decimal(price), currency, locale.
@@ -86,22 +80,8 @@ class Price(amo.models.ModelBase):
         :param optional region: an int for the region. Defaults to worldwide.
         :param optional provider: an int for the provider. Defaults to bango.
         """
-        region = region or WORLDWIDE.id
-        provider = provider or PROVIDER_BANGO
-        if not hasattr(self, '_currencies'):
-            Price.transformer([])
-
-        lookup = price_key({
-            'tier': self.id, 'carrier': carrier,
-            'provider': provider, 'region': region
-        })
-
-        try:
-            price_currency = Price._currencies[lookup]
-        except KeyError:
-            return None, None
-
-        return price_currency.price, price_currency.currency
+        return price_table.get_price_data(self.id, carrier=carrier,
+                                          region=region, provider=provider)
 
     def get_price(self, carrier=None, region=None, provider=None):
         """Return the price as a decimal for the current locale."""
@@ -110,10 +90,8 @@ class Price(amo.models.ModelBase):
 
     def get_price_locale(self, carrier=None, region=None, provider=None):
         """Return the price as a nicely localised string for the locale."""
-        price, currency = self.get_price_data(carrier=carrier, region=region,
-                                              provider=provider)
-        if price and currency:
-            return price_locale(price, currency)
+        return price_table.get_price_locale(self.id, carrier=carrier,
+                                            region=region, provider=provider)
 
     def prices(self, provider=None):
         """A list of dicts of all the currencies and prices for this tier."""
@@ -156,6 +134,98 @@ class PriceCurrency(amo.models.ModelBase):
         return u'%s, %s: %s' % (self.tier, self.currency, self.price)
 
 
+class PriceTable(object):
+    """
+    A copy of all the price tiers and their currencies kept in the process,
+    there are only a few hundred of them and they rarely change. Saving or
+    deleting a Price or PriceCurrency changes the version in memcache, each
+    process checks it at most every PRICE_TABLE_CHECK_INTERVAL seconds and
+    reloads the table when it has changed.
+    """
+    version_key = 'market:price-table:version'
+
+    def __init__(self):
+        self.version = None
+        self._checked = 0
+        # Tier name to tier id.
+        self.tiers = {}
+        # price_key to a (price, currency) tuple.
+        self.prices = {}
+        # (price_key, language) to the localised price.
+        self.locales = {}
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, 0)
+        self.version = None
+
+    def refresh(self):
+        now = time.time()
+        if (self.version is not None and
+            now - self._checked < settings.PRICE_TABLE_CHECK_INTERVAL):
+            return
+        self._checked = now
+        version = cache.get(self.version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(self.version_key, version, 0)
+        if version == self.version:
+            return
+        tiers = dict(Price.objects.no_cache().values_list('name', 'id'))
+        prices = dict((price_key(model_to_dict(p)), (p.price, p.currency))
+                      for p in PriceCurrency.objects.no_cache())
+        self.tiers, self.prices, self.locales = tiers, prices, {}
+        self.version = version
+
+    def get_tier(self, name):
+        """Returns the id of the tier called `name`, or None."""
+        self.refresh()
+        return self.tiers.get(name)
+
+    def lookup(self, tier, carrier=None, region=None, provider=None):
+        return price_key({
+            'tier': tier, 'carrier': carrier,
+            'provider': provider or PROVIDER_BANGO,
+            'region': region or WORLDWIDE.id
+        })
+
+    def get_price_data(self, tier, carrier=None, region=None, provider=None):
+        """
+        Returns a tuple of Decimal(price), currency for the tier id `tier`,
+        see Price.get_price_data.
+        """
+        self.refresh()
+        return self.prices.get(self.lookup(tier, carrier, region, provider),
+                               (None, None))
+
+    def get_price_locale(self, tier, carrier=None, region=None,
+                         provider=None):
+        """Returns the price as a localised string for the current locale."""
+        price, currency = self.get_price_data(tier, carrier=carrier,
+                                              region=region, provider=provider)
+        if not (price and currency):
+            return None
+        key = (self.lookup(tier, carrier, region, provider),
+               translation.get_language())
+        if key not in self.locales:
+            self.locales[key] = price_locale(price, currency)
+        return self.locales[key]
+
+
+price_table = PriceTable()
+
+
+@receiver(models.signals.post_save, sender=Price,
+          dispatch_uid='price_table_price_save')
+@receiver(models.signals.post_delete, sender=Price,
+          dispatch_uid='price_table_price_delete')
+@receiver(models.signals.post_save, sender=PriceCurrency,
+          dispatch_uid='price_table_currency_save')
+@receiver(models.signals.post_delete, sender=PriceCurrency,
+          dispatch_uid='price_table_currency_delete')
+def invalidate_price_table(sender, **kw):
+    price_table.invalidate()
+
+
 class AddonPurchase(amo.models.ModelBase):
     addon = models.ForeignKey('addons.Addon')
     user = models.ForeignKey(UserProfile)
@@ -219,6 +289,15 @@ def create_addon_purchase(sender, instance, **kw):
     cache.delete(memoize_key('users:purchase-ids', instance.user.pk))
 
 
+@receiver(models.signals.post_save, sender=AddonPurchase,
+          dispatch_uid='addon_purchase_verify_cache')
+@receiver(models.signals.post_delete, sender=AddonPurchase,
+          dispatch_uid='addon_purchase_verify_cache')
+def clear_purchase_verify_cache(sender, instance, **kw):
+    """Clears the cached purchase lookup used by receipt verification."""
+    cache.delete(purchase_key(instance.addon_id, instance.user_id))
+
+
 class AddonPremium(amo.models.ModelBase):
     """Additions to the Addon model that only apply to Premium add-ons."""
     addon = models.OneToOneField('addons.Addon')
@@ -3,6 +3,7 @@ from decimal import Decimal
 
 from django.utils import translation
 
+import mock
 from nose.tools import eq_, ok_
 
 import amo
@@ -10,7 +11,7 @@ import amo.tests
 from addons.models import Addon, AddonUser
 from constants.payments import PROVIDER_BANGO
 from market.models import (AddonPremium, PreApprovalUser, Price, PriceCurrency,
-                           Refund)
+                           Refund, price_table)
 from mkt.constants import apps
 from mkt.constants.regions import ALL_REGION_IDS
 from stats.models import Contribution
@@ -45,8 +46,6 @@ class TestPrice(amo.tests.TestCase):
 
     def setUp(self):
         self.tier_one = Price.objects.get(pk=1)
-        if hasattr(Price, '_currencies'):
-            del Price._currencies  # needed to pick up fixtures.
 
     def test_active(self):
         eq_(Price.objects.count(), 2)
@@ -87,12 +86,34 @@ class TestPrice(amo.tests.TestCase):
         eq_(Price.objects.get(pk=1).get_price(), Decimal('0.99'))
         eq_(Price.objects.get(pk=1).get_price_locale(), u'$0.99')
 
-    def test_transformer(self):
+    def test_price_table(self):
         price = Price.objects.get(pk=1)
         price.get_price_locale()
-        # Warm up Price._currencies.
+        # Warm up the price table.
         with self.assertNumQueries(0):
             eq_(price.get_price_locale(), u'$0.99')
+            eq_(Price(pk=1).get_price(), Decimal('0.99'))
+
+    def test_price_table_invalidated(self):
+        eq_(self.tier_one.get_price(), Decimal('0.99'))
+        currency = PriceCurrency.objects.get(tier=self.tier_one, region=1,
+                                             provider=PROVIDER_BANGO)
+        currency.price = Decimal('0.89')
+        currency.save()
+        eq_(self.tier_one.get_price(), Decimal('0.89'))
+        currency.delete()
+        eq_(self.tier_one.get_price(), None)
+
+    def test_price_table_check_interval(self):
+        eq_(self.tier_one.get_price(), Decimal('0.99'))
+        with self.settings(PRICE_TABLE_CHECK_INTERVAL=60):
+            with mock.patch('market.models.cache') as cache:
+                eq_(self.tier_one.get_price(), Decimal('0.99'))
+                assert not cache.get.called
+
+    def test_price_table_tier(self):
+        eq_(price_table.get_tier(self.tier_one.name), self.tier_one.pk)
+        eq_(price_table.get_tier('nope'), None)
 
     def test_get_tier_price(self):
         eq_(PriceCurrency.objects.get(pk=3).get_price_locale(), 'R$1.01')
@@ -4,6 +4,8 @@ import datetime
 from decimal import Decimal
 import json
 
+from django.conf import settings
+
 import mock
 from nose.tools import eq_
 from pyquery import PyQuery as pq
@@ -769,6 +771,34 @@ class TestSiteQuery(amo.tests.TestCase):
                           self.start, self.end)
 
 
+@mock.patch.object(settings, 'MONOLITH_SERVER', 'http://0.0.0.0:0')
+@mock.patch('monolith.client.Client')
+class TestMonolithSiteQuery(amo.tests.TestCase):
+
+    def setUp(self):
+        self.start = datetime.date(2012, 1, 1)
+        self.end = datetime.date(2012, 1, 31)
+
+    def query(self):
+        return views._monolith_site_query('date', self.start, self.end,
+                                          'apps_count_new')
+
+    def test_cached(self, client):
+        client.return_value.return_value = [
+            {'date': datetime.date(2012, 1, 2), 'count': 3}]
+        expected = ([{'date': '2012-01-02', 'data': {'apps_count_new': 3}}],
+                    views._CACHED_KEYS)
+        eq_(self.query(), expected)
+        eq_(self.query(), expected)
+        eq_(client.return_value.call_count, 1)
+
+    def test_error_not_cached(self, client):
+        client.return_value.side_effect = ValueError('Down.')
+        eq_(self.query(), ([], views._CACHED_KEYS))
+        self.query()
+        eq_(client.return_value.call_count, 2)
+
+
 @mock.patch('stats.views._site_query')
 class TestSite(amo.tests.TestCase):
 
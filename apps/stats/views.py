@@ -486,7 +486,8 @@ _KEYS = {
 _CACHED_KEYS = sorted(_KEYS.values())
 
 
-def _monolith_site_query(period, start, end, field):
+@memoize(prefix='global_stats', time=60 * 60)
+def _monolith_site_data(period, start, end, field):
     fields = {'mmo_total_visitors': 'visits',
               'apps_count_installed': 'app_installs',
               'apps_review_count_new': 'review_count',
@@ -504,23 +505,22 @@ def _monolith_site_query(period, start, end, field):
     # The end date is included.
     start = start + timedelta(days=1)
 
-    def _get_data():
-        for result in client(fields[field], start, end, interval=period,
-                             strict_range=False):
-            yield {'date': result['date'].strftime('%Y-%m-%d'),
-                   'data': {field: result['count']}}
+    return [{'date': result['date'].strftime('%Y-%m-%d'),
+             'data': {field: result['count']}}
+            for result in client(fields[field], start, end, interval=period,
+                                 strict_range=False)]
+
 
+def _monolith_site_query(period, start, end, field):
+    # Errors aren't cached, the next request tries again.
     try:
-        return list(_get_data()), _CACHED_KEYS
+        return _monolith_site_data(period, start, end, field), _CACHED_KEYS
     except ValueError, e:
         if len(e.args) > 0:
             logger.error(e.args[0])
         return [], _CACHED_KEYS
 
 
-# XXX deactivated until we're happy with monolith
-#@memoize(prefix='global_stats', time=60 * 60)
-#
 def _site_query(period, start, end, field=None, request=None):
     old_version = request and request.GET.get('old_version', '0') or '0'
 
@@ -528,6 +528,11 @@ def _site_query(period, start, end, field=None, request=None):
         res = _monolith_site_query(period, start, end, field)
         return res
 
+    return _db_site_query(period, start, end)
+
+
+@memoize(prefix='global_stats_db', time=60 * 60)
+def _db_site_query(period, start, end):
     cursor = connection.cursor()
     # Let MySQL make this fast. Make sure we prevent SQL injection with the
     # assert.
@@ -63,3 +63,13 @@ def update_user_ratings_task(data, **kw):
     for pk, rating in data:
         rating = "%.2f" % round(rating, 2)
         UserProfile.objects.filter(pk=pk).update(averagerating=rating)
+
+
+@task
+def update_user_region(pk, region, **kw):
+    task_log.debug('[1@None] Updating region of user %s to %s.'
+                   % (pk, region))
+    try:
+        UserProfile.objects.get(pk=pk).update(region=region)
+    except UserProfile.DoesNotExist:
+        task_log.info('User %s does not exist.' % pk)
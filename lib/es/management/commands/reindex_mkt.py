@@ -14,15 +14,17 @@ import time
 from optparse import make_option
 
 import pyelasticsearch
-from celery import task
+import redisutils
+from celery import chord, task
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
 
 from amo.utils import chunked, timestamp_index
 from addons.models import Webapp  # To avoid circular import.
 from lib.es.models import Reindexing
-from lib.es.utils import database_flagged
+from lib.es.utils import database_flagged, reindex_writes_key
 
 from mkt.webapps.models import WebappIndexer
 
@@ -49,6 +51,12 @@ ES = pyelasticsearch.ElasticSearch(ES_URL)
 
 job = 'lib.es.management.commands.reindex_mkt.run_indexing'
 time_limits = settings.CELERY_TIME_LIMITS[job]
+chunk_time_limits = settings.CELERY_TIME_LIMITS[
+    'lib.es.management.commands.reindex_mkt.index_chunk']
+
+# Our ES doc sizes are about 5k in size. Chunking by 100 sends ~500kb of data
+# to ES at a time.
+CHUNK_SIZE = 100
 
 
 @task
@@ -92,28 +100,111 @@ def index_webapp(ids, **kw):
 
     qs = Webapp.indexing_transformer(Webapp.uncached.filter(id__in=ids))
 
-    docs = [WebappIndexer.extract_document(obj.id, obj=obj) for obj in qs]
+    docs = WebappIndexer.extract_documents(list(qs))
     WebappIndexer.bulk_index(docs, es=ES, index=index)
 
 
+@task(ignore_result=False, time_limit=chunk_time_limits['hard'],
+      soft_time_limit=chunk_time_limits['soft'])
+def index_chunk(ids, index):
+    """Index a chunk of apps, one task of the run_indexing chord.
+
+    Returns the number of apps indexed, or None if the chunk failed. Failures
+    are returned rather than raised so the chord callback always runs and can
+    decide not to use the new index.
+
+    """
+    progress = Reindexing.objects.filter(new_index=index)
+    try:
+        index_webapp(ids, index=index)
+    except Exception:
+        logger.exception('Failed to index apps %s-%s into %s'
+                         % (ids[0], ids[-1], index))
+        progress.update(chunks_failed=F('chunks_failed') + 1)
+        return None
+    progress.update(chunks_done=F('chunks_done') + 1)
+    return len(ids)
+
+
 @task(time_limit=time_limits['hard'], soft_time_limit=time_limits['soft'])
-def run_indexing(index):
+def run_indexing(new_index, old_index, alias, settings):
     """Index the objects.
 
-    - index: name of the index
+    - new_index: name of the index to fill
+    - old_index: name of the index the alias currently points to, if any
+    - alias: alias name
+    - settings: settings to apply to the new index when it is complete
+
+    Each chunk of ids is indexed by its own task, in parallel. Once they are
+    all done `finish_indexing` points the alias to the new index.
+
+    """
+    sys.stdout.write('Indexing apps into index: %s' % new_index)
 
-    Note: Our ES doc sizes are about 5k in size. Chunking by 100 sends ~500kb
-    of data to ES at a time.
+    ids = list(WebappIndexer.get_indexable())
+    chunks = list(chunked(ids, CHUNK_SIZE))
+    Reindexing.objects.filter(new_index=new_index).update(chunks=len(chunks))
 
-    TODO: Use celery chords here to parallelize these indexing chunks. This
-          requires celery 3 (bug 825938).
+    callback = finish_indexing.s(new_index, old_index, alias, settings)
+    if not chunks:
+        # A chord with nothing in it never calls back.
+        callback.delay([])
+        return
+    chord(index_chunk.si(chunk, new_index) for chunk in chunks)(callback)
+
+
+@task
+def finish_indexing(results, new_index, old_index, alias, settings):
+    """Chord callback of run_indexing, called with the result of each chunk.
+
+    The alias is only pointed to the new index if every chunk was indexed,
+    otherwise the new index is dropped and the alias left alone.
 
     """
-    sys.stdout.write('Indexing apps into index: %s' % index)
+    progress = Reindexing.objects.get(new_index=new_index)
+    if (len(results) != progress.chunks or progress.chunks_failed or
+            None in results):
+        logger.error('Reindexing into %s failed: %s of %s chunks done, %s '
+                     'failed.' % (new_index, progress.chunks_done,
+                                  progress.chunks, progress.chunks_failed))
+        unflag_database()
+        delete_index(new_index)
+        sys.stdout.write('Reindexation failed, %s left unchanged.\n' % alias)
+        return
+
+    catch_up(new_index, progress.start_date)
+    update_alias(new_index, old_index, alias, settings)
+    unflag_database()
+    if old_index:
+        delete_index(old_index)
+    output_summary()
 
-    qs = WebappIndexer.get_indexable()
-    for chunk in chunked(list(qs), 100):
-        index_webapp(chunk, index=index)
+
+def catch_up(new_index, start_date):
+    """
+    Replay the apps changed since the reindex started into the new index.
+
+    Those were written to both indexes as they changed, but a chunk that read
+    them earlier could have overwritten that in the new index. Apps that are
+    no longer indexable are removed from it.
+
+    """
+    redis = redisutils.connections['master']
+    key = reindex_writes_key(new_index)
+    ids = set(int(id_) for id_ in redis.smembers(key))
+    ids.update(Webapp.uncached.filter(modified__gte=start_date)
+                              .values_list('id', flat=True))
+    redis.delete(key)
+    sys.stdout.write('Catching up %s apps changed while indexing' % len(ids))
+
+    indexable = set(WebappIndexer.get_indexable().filter(id__in=ids))
+    for chunk in chunked(sorted(indexable), CHUNK_SIZE):
+        index_webapp(chunk, index=new_index)
+    for id_ in ids - indexable:
+        try:
+            WebappIndexer.unindex(id_=id_, es=ES, index=new_index)
+        except pyelasticsearch.exceptions.ElasticHttpNotFoundError:
+            pass
 
 
 @task
@@ -235,23 +326,12 @@ class Command(BaseCommand):
             'store.compress.tv': True, 'store.compress.stored': True,
             'refresh_interval': '-1'})
 
-        # Index all the things!
-        chain |= run_indexing.si(new_index)
-
-        # After indexing we optimize the index, adjust settings, and point the
-        # alias to the new index.
-        chain |= update_alias.si(new_index, old_index, ALIAS, {
+        # Index all the things! Once every chunk is indexed we optimize the
+        # index, adjust settings, point the alias to the new index, unflag the
+        # database and delete the old index, if any.
+        chain |= run_indexing.si(new_index, old_index, ALIAS, {
             'number_of_replicas': num_replicas, 'refresh_interval': '5s'})
 
-        # Unflag the database.
-        chain |= unflag_database.si()
-
-        # Delete the old index, if any.
-        if old_index:
-            chain |= delete_index.si(old_index)
-
-        chain |= output_summary.si()
-
         self.stdout.write('\nNew index and indexing tasks all queued up.\n')
         os.environ['FORCE_INDEXING'] = '1'
         try:
@@ -6,6 +6,10 @@ class Reindexing(models.Model):
     old_index = models.CharField(max_length=255, null=True)
     new_index = models.CharField(max_length=255)
     alias = models.CharField(max_length=255)
+    # Progress of the indexing chunks, see reindex_mkt.run_indexing.
+    chunks = models.PositiveIntegerField(default=0)
+    chunks_done = models.PositiveIntegerField(default=0)
+    chunks_failed = models.PositiveIntegerField(default=0)
 
     class Meta:
         db_table = 'zadmin_reindexing'
@@ -0,0 +1,92 @@
+import datetime
+
+import mock
+import redisutils
+from nose.tools import eq_
+
+import amo
+import amo.tests
+from lib.es.management.commands import reindex_mkt
+from lib.es.models import Reindexing
+from lib.es.utils import reindex_writes_key
+from mkt.webapps.models import Webapp
+
+
+class TestRunIndexing(amo.tests.TestCase):
+
+    def setUp(self):
+        self.reindex = Reindexing.objects.create(
+            new_index='new', old_index='old', alias='webapp', chunks=2,
+            start_date=datetime.datetime.now())
+
+    def progress(self):
+        return Reindexing.objects.get(pk=self.reindex.pk)
+
+    @mock.patch.object(reindex_mkt, 'index_webapp')
+    def test_index_chunk(self, index_webapp):
+        eq_(reindex_mkt.index_chunk([1, 2], 'new'), 2)
+        index_webapp.assert_called_with([1, 2], index='new')
+        eq_(self.progress().chunks_done, 1)
+
+    @mock.patch.object(reindex_mkt, 'index_webapp')
+    def test_index_chunk_failed(self, index_webapp):
+        index_webapp.side_effect = ValueError
+        eq_(reindex_mkt.index_chunk([1, 2], 'new'), None)
+        eq_(self.progress().chunks_done, 0)
+        eq_(self.progress().chunks_failed, 1)
+
+    @mock.patch.object(reindex_mkt, 'output_summary')
+    @mock.patch.object(reindex_mkt, 'delete_index')
+    @mock.patch.object(reindex_mkt, 'update_alias')
+    @mock.patch.object(reindex_mkt, 'catch_up')
+    def test_finish(self, catch_up, update_alias, delete_index,
+                    output_summary):
+        reindex_mkt.finish_indexing([100, 3], 'new', 'old', 'webapp', {})
+        catch_up.assert_called_with('new', self.reindex.start_date)
+        update_alias.assert_called_with('new', 'old', 'webapp', {})
+        delete_index.assert_called_with('old')
+        assert not Reindexing.objects.exists()
+
+    @mock.patch.object(reindex_mkt, 'delete_index')
+    @mock.patch.object(reindex_mkt, 'update_alias')
+    def test_finish_failed(self, update_alias, delete_index):
+        reindex_mkt.finish_indexing([100, None], 'new', 'old', 'webapp', {})
+        assert not update_alias.called
+        delete_index.assert_called_with('new')
+        assert not Reindexing.objects.exists()
+
+    @mock.patch.object(reindex_mkt, 'delete_index')
+    @mock.patch.object(reindex_mkt, 'update_alias')
+    def test_finish_missing_chunk(self, update_alias, delete_index):
+        reindex_mkt.finish_indexing([100], 'new', 'old', 'webapp', {})
+        assert not update_alias.called
+
+
+@mock.patch.object(reindex_mkt, 'index_webapp')
+@mock.patch.object(reindex_mkt.WebappIndexer, 'unindex')
+class TestCatchUp(amo.tests.RedisTest, amo.tests.TestCase):
+
+    def setUp(self):
+        self.start = datetime.datetime.now()
+        self.app = amo.tests.app_factory()
+        self.redis = redisutils.connections['master']
+
+    def test_modified(self, unindex, index_webapp):
+        reindex_mkt.catch_up('new', self.start)
+        index_webapp.assert_called_with([self.app.id], index='new')
+        assert not unindex.called
+
+    def test_written(self, unindex, index_webapp):
+        Webapp.objects.filter(pk=self.app.pk).update(
+            modified=self.start - datetime.timedelta(days=1))
+        self.redis.sadd(reindex_writes_key('new'), self.app.id)
+        reindex_mkt.catch_up('new', self.start)
+        index_webapp.assert_called_with([self.app.id], index='new')
+        eq_(self.redis.smembers(reindex_writes_key('new')), set())
+
+    def test_not_indexable(self, unindex, index_webapp):
+        self.app.update(status=amo.STATUS_DELETED)
+        reindex_mkt.catch_up('new', self.start)
+        assert not index_webapp.called
+        unindex.assert_called_with(id_=self.app.id, es=reindex_mkt.ES,
+                                   index='new')
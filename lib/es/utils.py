@@ -38,17 +38,26 @@ def index_objects(ids, model, search, index=None, transforms=None):
     amo.search.get_es().flush_bulk(forced=True)
 
 
-def database_flagged():
-    """Returns True if the Database is being indexed"""
-    return Reindexing.objects.exists()
+def reindex_writes_key(new_index):
+    """The redis set of ids written while `new_index` is being filled."""
+    return 'es:reindex:writes:%s' % new_index
 
 
-def raise_if_reindex_in_progress():
+def database_flagged(alias=None):
+    """Returns True if the Database is being indexed, into `alias` if given."""
+    qs = Reindexing.objects.all()
+    if alias:
+        qs = qs.filter(alias=alias)
+    return qs.exists()
+
+
+def raise_if_reindex_in_progress(alias=None):
     """Checks if the database indexation flag is on.
 
     If it's one, and if no "FORCE_INDEXING" variable is present in the env,
-    raises a CommandError.
+    raises a CommandError. Pass the `alias` a job writes to so it only waits
+    for reindexes of that alias.
     """
-    if database_flagged() and 'FORCE_INDEXING' not in os.environ:
+    if database_flagged(alias) and 'FORCE_INDEXING' not in os.environ:
         raise CommandError("Indexation already occuring. Add a FORCE_INDEXING "
                            "variable in the environ to force it")
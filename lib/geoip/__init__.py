@@ -1,22 +1,124 @@
+import csv
 import logging
+import os
+import socket
+import struct
+from bisect import bisect_right
+from time import time
 
 import requests
 import waffle
 from django_statsd.clients import statsd
 
+from lib.misc.lru import LRUCache
 from mkt import regions
 
 log = logging.getLogger('z.geoip')
 
 
+def ip_to_int(address):
+    """Returns an IPv4 address as an int, or None if it isn't one."""
+    try:
+        return struct.unpack('!L', socket.inet_aton(address.strip()))[0]
+    except (AttributeError, socket.error):
+        return None
+
+
+class LocalGeoIP(object):
+    """
+    Resolves IPv4 addresses to country codes with a table of address ranges
+    kept in memory.
+
+    The table is a CSV file with the first address, the last address and
+    the country code of a range on each line. The GeoLite country CSV, which
+    has the ranges as numbers as well and the country name at the end, works
+    too. The file is loaded on the first lookup and again when it changes,
+    which is checked at most every `check_interval` seconds.
+    """
+
+    def __init__(self, path, check_interval=60):
+        self.path = path
+        self.check_interval = check_interval
+        self._checked = 0
+        self._mtime = None
+        # The starts and ends of the ranges, sorted, and their countries.
+        self._table = ([], [], [])
+
+    def load(self):
+        ranges = []
+        with open(self.path) as f:
+            for row in csv.reader(f):
+                if len(row) >= 5:
+                    start, end, country = row[2], row[3], row[4]
+                    start = int(start) if start.isdigit() else None
+                    end = int(end) if end.isdigit() else None
+                elif len(row) == 3:
+                    start, end, country = row
+                    start, end = ip_to_int(start), ip_to_int(end)
+                else:
+                    continue
+                # Skips headers and anything else that isn't a range.
+                if start is not None and end is not None:
+                    ranges.append((start, end, country.strip().lower()))
+        ranges.sort()
+        # Swap the whole table at once for the threads looking things up.
+        self._table = ([r[0] for r in ranges], [r[1] for r in ranges],
+                       [r[2] for r in ranges])
+        log.info('Loaded %s GeoIP ranges from %s' % (len(ranges), self.path))
+
+    def refresh(self):
+        now = time()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError, e:
+            log.error('GeoIP database unavailable: %s' % e)
+            return
+        if mtime != self._mtime:
+            try:
+                self.load()
+            except (IOError, csv.Error), e:
+                # Keep the table we have, this is tried again at the next
+                # check.
+                log.error('Could not load the GeoIP database: %s' % e)
+                return
+            self._mtime = mtime
+
+    def lookup(self, address):
+        """Returns the country code of `address`, or None if it's unknown."""
+        self.refresh()
+        ip = ip_to_int(address)
+        if ip is None:
+            return None
+        starts, ends, countries = self._table
+        i = bisect_right(starts, ip) - 1
+        if i >= 0 and ip <= ends[i]:
+            return countries[i]
+        return None
+
+
 class GeoIP:
-    """Call to geodude server to resolve an IP to Geo Info block."""
+    """
+    Resolve an IP to a country, with the table in GEOIP_PATH if there is one
+    or by calling the geodude server.
+    """
 
     def __init__(self, settings):
         self.timeout = float(getattr(settings, 'GEOIP_DEFAULT_TIMEOUT', .2))
         self.url = getattr(settings, 'GEOIP_URL', '')
         self.default_val = getattr(settings, 'GEOIP_DEFAULT_VAL',
                                    regions.WORLDWIDE.slug).lower()
+        path = getattr(settings, 'GEOIP_PATH', '')
+        self.local = None
+        if path:
+            self.local = LocalGeoIP(
+                path, getattr(settings, 'GEOIP_RELOAD_INTERVAL', 60))
+        # Addresses already resolved by geodude.
+        self.cache = LRUCache(
+            size=getattr(settings, 'GEOIP_CACHE_SIZE', 10000),
+            timeout=getattr(settings, 'GEOIP_CACHE_TIMEOUT', 60 * 60))
 
     def lookup(self, address):
         """Resolve an IP address to a block of geo information.
@@ -25,7 +127,15 @@ class GeoIP:
         return the default as defined by the settings, or "worldwide".
 
         """
+        if self.local:
+            with statsd.timer('z.geoip.local'):
+                return self.local.lookup(address) or self.default_val
+
         if self.url and waffle.switch_is_active('geoip-geodude'):
+            cached = self.cache.get(address)
+            if cached is not None:
+                statsd.incr('z.geoip.cache.hit')
+                return cached
             with statsd.timer('z.geoip'):
                 res = None
                 try:
@@ -38,6 +148,8 @@ class GeoIP:
                 except requests.RequestException as e:
                     log.error('Geodude connection error: {0}'.format(str(e)))
                 if res and res.status_code == 200:
-                    return res.json().get('country_code',
-                                        self.default_val).lower()
+                    country = res.json().get('country_code',
+                                             self.default_val).lower()
+                    self.cache.set(address, country)
+                    return country
         return self.default_val
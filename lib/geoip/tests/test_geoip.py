@@ -1,15 +1,20 @@
+import os
+import tempfile
+
 import mock
 import requests
 from nose.tools import eq_
 
 import amo.tests
 
-from lib.geoip import GeoIP
+from lib.geoip import GeoIP, LocalGeoIP
 
 
-def generate_settings(url='', default='worldwide', timeout=0.2):
+def generate_settings(url='', default='worldwide', timeout=0.2, path=''):
     return mock.Mock(GEOIP_URL=url, GEOIP_DEFAULT_VAL=default,
-                     GEOIP_DEFAULT_TIMEOUT=timeout)
+                     GEOIP_DEFAULT_TIMEOUT=timeout, GEOIP_PATH=path,
+                     GEOIP_RELOAD_INTERVAL=0, GEOIP_CACHE_SIZE=10,
+                     GEOIP_CACHE_TIMEOUT=60)
 
 
 class GeoIPTest(amo.tests.TestCase):
@@ -31,6 +36,16 @@ class GeoIPTest(amo.tests.TestCase):
                                      timeout=0.2, data={'ip': ip})
         eq_(result, 'us')
 
+    @mock.patch('requests.post')
+    def test_lookup_cached(self, mock_post):
+        geoip = GeoIP(generate_settings(url='localhost'))
+        mock_post.return_value = mock.Mock(status_code=200, json=lambda: {
+            'country_code': 'US',
+        })
+        eq_(geoip.lookup('1.1.1.1'), 'us')
+        eq_(geoip.lookup('1.1.1.1'), 'us')
+        eq_(mock_post.call_count, 1)
+
     @mock.patch('requests.post')
     def test_no_url(self, mock_post):
         geoip = GeoIP(generate_settings())
@@ -70,3 +85,65 @@ class GeoIPTest(amo.tests.TestCase):
         mock_post.assert_called_with('{0}/country.json'.format(url),
                                      timeout=0.2, data={'ip': ip})
         eq_(result, 'worldwide')
+
+
+class LocalGeoIPTest(amo.tests.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.write('start,end,country\n'
+                   '1.0.0.0,1.0.0.255,US\n'
+                   '"2.0.0.0","2.0.255.255","33554432","33619967","PL",'
+                   '"Poland"\n')
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, data):
+        with open(self.path, 'w') as f:
+            f.write(data)
+
+    def test_lookup(self):
+        geoip = LocalGeoIP(self.path)
+        eq_(geoip.lookup('1.0.0.1'), 'us')
+        eq_(geoip.lookup('1.0.0.255'), 'us')
+        eq_(geoip.lookup('2.0.1.1'), 'pl')
+
+    def test_lookup_unknown(self):
+        geoip = LocalGeoIP(self.path)
+        eq_(geoip.lookup('0.255.255.255'), None)
+        eq_(geoip.lookup('1.0.1.0'), None)
+        eq_(geoip.lookup('3.0.0.0'), None)
+        eq_(geoip.lookup('::1'), None)
+        eq_(geoip.lookup(None), None)
+
+    def test_reload(self):
+        geoip = LocalGeoIP(self.path, check_interval=0)
+        eq_(geoip.lookup('1.0.0.1'), 'us')
+        self.write('1.0.0.0,1.0.0.255,BR\n')
+        os.utime(self.path, (0, 0))
+        eq_(geoip.lookup('1.0.0.1'), 'br')
+
+    def test_reload_bad_file(self):
+        geoip = LocalGeoIP(self.path, check_interval=0)
+        eq_(geoip.lookup('1.0.0.1'), 'us')
+        self.write('1.0.0.0,1.0.0.255,BR\n\x00\n')
+        os.utime(self.path, (0, 0))
+        eq_(geoip.lookup('1.0.0.1'), 'us')
+
+    def test_reload_file_gone(self):
+        geoip = LocalGeoIP(self.path, check_interval=0)
+        eq_(geoip.lookup('1.0.0.1'), 'us')
+        # The file was rotated between the stat and the open.
+        with mock.patch('os.path.getmtime', lambda path: 0):
+            with mock.patch('__builtin__.open') as open_:
+                open_.side_effect = IOError('No such file')
+                eq_(geoip.lookup('1.0.0.1'), 'us')
+
+    @mock.patch('requests.post')
+    def test_geoip_local(self, mock_post):
+        geoip = GeoIP(generate_settings(url='localhost', path=self.path))
+        eq_(geoip.lookup('2.0.1.1'), 'pl')
+        eq_(geoip.lookup('3.0.0.0'), 'worldwide')
+        assert not mock_post.called
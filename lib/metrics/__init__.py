@@ -30,19 +30,29 @@ def record_action(action, request, data=None):
     record_stat(action, request, **data)
 
 
-def get_monolith_client():
-    _locals = threading.local()
-    if not hasattr(_locals, 'monolith'):
-        server = getattr(settings, 'MONOLITH_SERVER', None)
-        if server is None:
-            raise ValueError('You need to configure MONOLITH_SERVER')
+# Each thread's monolith client, see get_monolith_client.
+_locals = threading.local()
+
 
+def get_monolith_client():
+    """
+    Returns the monolith client of the current thread. It is made on first
+    use and reused after that, along with its connections.
+    """
+    server = getattr(settings, 'MONOLITH_SERVER', None)
+    if server is None:
+        raise ValueError('You need to configure MONOLITH_SERVER')
+
+    from monolith.client import Client as MonolithClient
+    # A new server or client class, in tests, needs a new client.
+    key = (server, MonolithClient)
+    if getattr(_locals, 'monolith_key', None) != key:
         # XXX will use later
         max_range = getattr(settings, 'MONOLITH_MAX_DATE_RANGE', 365)
         statsd = {'statsd.host': getattr(settings, 'STATSD_HOST', 'localhost'),
                   'statsd.port': getattr(settings, 'STATSD_PORT', 8125)}
 
-        from monolith.client import Client as MonolithClient
         _locals.monolith = MonolithClient(server, **statsd)
+        _locals.monolith_key = key
 
     return _locals.monolith
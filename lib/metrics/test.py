@@ -1,8 +1,11 @@
 # -*- coding: utf8 -*-
+from django.conf import settings
+
 import mock
+from nose.tools import eq_
 
 import amo.tests
-from lib.metrics import record_action
+from lib.metrics import get_monolith_client, record_action
 
 
 class TestMetrics(amo.tests.TestCase):
@@ -16,3 +19,17 @@ class TestMetrics(amo.tests.TestCase):
         record_action('install', request, {})
         record_stat.assert_called_with('install', request,
             **{'locale': 'en', 'src': 'foo', 'user-agent': 'py'})
+
+    @mock.patch.object(settings, 'MONOLITH_SERVER', 'http://0.0.0.0:0')
+    @mock.patch('monolith.client.Client')
+    def test_monolith_client_reused(self, client):
+        eq_(get_monolith_client(), get_monolith_client())
+        eq_(client.call_count, 1)
+
+    @mock.patch('monolith.client.Client')
+    def test_monolith_client_new_server(self, client):
+        client.side_effect = lambda server, **kw: server
+        with mock.patch.object(settings, 'MONOLITH_SERVER', 'http://a'):
+            eq_(get_monolith_client(), 'http://a')
+        with mock.patch.object(settings, 'MONOLITH_SERVER', 'http://b'):
+            eq_(get_monolith_client(), 'http://b')
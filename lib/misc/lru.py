@@ -0,0 +1,69 @@
+"""
+A small, thread safe, in-process LRU cache with optional expiry.
+
+It deliberately has no Django imports so that it can be used from the
+services WSGI apps as well as from zamboni itself.
+
+Usage::
+
+    >>> from lib.misc.lru import LRUCache
+    >>> cache = LRUCache(size=2, timeout=60)
+    >>> cache.set('a', 1)
+    >>> cache.get('a')
+    1
+
+"""
+import threading
+from time import time
+
+from ordereddict import OrderedDict
+
+
+class LRUCache(object):
+
+    def __init__(self, size=1000, timeout=None):
+        """
+        :param size: the maximum number of keys kept, the least recently
+            used key is dropped when this is exceeded.
+        :param timeout: the default number of seconds a key is kept for,
+            None keeps it until it falls off the end of the cache.
+        """
+        self.size = size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires < time():
+                return default
+            # Re-inserting moves the key to the most recently used end.
+            self._data[key] = (expires, value)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        expires = time() + timeout if timeout is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,46 @@
+from mock import patch
+from nose.tools import eq_
+
+from lib.misc.lru import LRUCache
+
+
+def test_get_set():
+    cache = LRUCache(size=2)
+    cache.set('a', 1)
+    eq_(cache.get('a'), 1)
+    eq_(cache.get('b'), None)
+    eq_(cache.get('b', 2), 2)
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    eq_(len(cache), 2)
+
+
+@patch('lib.misc.lru.time')
+def test_timeout(time):
+    time.return_value = 100
+    cache = LRUCache(timeout=10)
+    cache.set('a', 1)
+    cache.set('b', 2, timeout=20)
+    time.return_value = 115
+    eq_(cache.get('a'), None)
+    eq_(cache.get('b'), 2)
+
+
+def test_delete():
+    cache = LRUCache()
+    cache.set('a', 1)
+    cache.delete('a')
+    cache.delete('missing')
+    assert 'a' not in cache
+    cache.set('b', 1)
+    cache.clear()
+    eq_(len(cache), 0)
@@ -103,6 +103,47 @@ SERVICES_DATABASE = {
     'HOST': '',
 }
 
+# The DB-API module the services connect with: 'MySQLdb' or 'pymysql'. Use
+# 'pymysql' when running the services under gevent or eventlet workers, it is
+# pure Python so monkey patching makes its queries cooperative.
+SERVICES_DATABASE_DRIVER = 'MySQLdb'
+
+# Arguments for the connection pool shared by all the services. With a
+# cooperative driver, size this to the number of in-flight requests a worker
+# should hold rather than the number of threads.
+SERVICES_DATABASE_POOL = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'recycle': 300,
+    'timeout': 30,
+}
+
+# Serve services/update.py from an in-process index instead of running SQL
+# for each update ping. The index is refreshed with the add-ons modified in
+# the last SERVICES_UPDATE_INDEX_REFRESH seconds and rebuilt from scratch
+# every SERVICES_UPDATE_INDEX_REBUILD seconds, both in a background thread.
+# Deleted versions and files are only dropped by the rebuild, so they can be
+# offered for up to SERVICES_UPDATE_INDEX_REBUILD seconds.
+SERVICES_UPDATE_INDEX = False
+SERVICES_UPDATE_INDEX_REFRESH = 60
+SERVICES_UPDATE_INDEX_REBUILD = 60 * 10
+
+# Cache the RDF rendered by services/update.py in memcache, and for a short
+# time in a per worker LRU in front of it. The memcache entries are
+# invalidated when a file or version of the add-on changes.
+SERVICES_UPDATE_CACHE = True
+SERVICES_UPDATE_CACHE_TIMEOUT = 60 * 60
+SERVICES_UPDATE_CACHE_LOCAL_SIZE = 1000
+SERVICES_UPDATE_CACHE_LOCAL_TIMEOUT = 30
+
+# How long services/theme_update.py caches a response. The cache key
+# includes the theme's modified time, so changes show up straight away.
+THEME_UPDATE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# How many rendered plugin finder responses each services/pfs.py process
+# keeps.
+PFS_CACHE_SIZE = 10000
+
 DATABASE_ROUTERS = ('multidb.PinningMasterSlaveRouter',)
 
 # For use django-mysql-pool backend.
@@ -1107,6 +1148,10 @@ CELERY_TIME_LIMITS = {
         'soft': 60 * 10,  # 10 mins to reindex.
         'hard': 60 * 20,  # 20 mins hard limit.
     },
+    'lib.es.management.commands.reindex_mkt.index_chunk': {
+        'soft': 60 * 5,
+        'hard': 60 * 10,
+    },
 }
 
 # When testing, we always want tasks to raise exceptions. Good for sanity.
@@ -1376,6 +1421,10 @@ ES_TIMEOUT = 30
 ES_DEFAULT_NUM_REPLICAS = 2
 ES_DEFAULT_NUM_SHARDS = 5
 
+# Saved apps are queued and indexed in bulk at most this many seconds later,
+# each app once however often it was saved. 0 indexes them straight away.
+ES_INDEX_QUEUE_DELAY = 10
+
 # Default AMO user id to use for tasks.
 TASK_USER_ID = 4757633
 
@@ -1419,6 +1468,27 @@ WEBAPPS_RECEIPT_KEY = ''
 WEBAPPS_RECEIPT_EXPIRY_SECONDS = 60 * 60 * 24 * 182
 # Send a new receipt back when it expires.
 WEBAPPS_RECEIPT_EXPIRED_SEND = False
+# The most receipts that can be posted to the batch verification URL,
+# which is WEBAPPS_RECEIPT_URL + 'batch/'.
+WEBAPPS_RECEIPT_BATCH_SIZE = 100
+# How long the receipt verifier and key are kept before being reloaded.
+WEBAPPS_RECEIPT_KEY_TIMEOUT = 60 * 60
+# How many decoded receipts to keep in each verification process, and for
+# how long. A receipt in this cache isn't checked against the certs again.
+WEBAPPS_RECEIPT_CACHE_SIZE = 10000
+WEBAPPS_RECEIPT_CACHE_TIMEOUT = 60 * 5
+# How long the install and purchase lookups for a receipt are cached in
+# memcache, and in each verification process.
+WEBAPPS_RECEIPT_LOOKUP_TIMEOUT = 60 * 60
+WEBAPPS_RECEIPT_LOOKUP_LOCAL_SIZE = 10000
+WEBAPPS_RECEIPT_LOOKUP_LOCAL_TIMEOUT = 10
+# How long the cached part of an app in the API is kept. Saving the app or
+# the rows it is built from invalidates it, this bounds how stale the counts
+# that are updated in bulk, like weekly downloads, can get.
+WEBAPPS_APP_DICT_CACHE_TIMEOUT = 60 * 10
+# How often each process checks memcache for changes to the price tiers it
+# keeps in memory. Changes made in the same process show up straight away.
+PRICE_TABLE_CHECK_INTERVAL = 60
 
 CSRF_FAILURE_VIEW = 'amo.views.csrf_failure'
 
@@ -1548,6 +1618,11 @@ JINGO_MINIFY_USE_STATIC = False
 # Monolith settings.
 MONOLITH_SERVER = None
 MONOLITH_MAX_DATE_RANGE = 365
+# Each process inserts the monolith records of tracked actions in bulk, once
+# this many are waiting or every MONOLITH_BUFFER_TIMEOUT seconds. Set to 0 to
+# insert each one as it is recorded.
+MONOLITH_BUFFER_SIZE = 100
+MONOLITH_BUFFER_TIMEOUT = 10
 
 # These are useful services, like error generation, getting settings and the
 # like. They should *not* be on in production.
@@ -0,0 +1,4 @@
+ALTER TABLE `zadmin_reindexing`
+    ADD COLUMN `chunks` int(11) unsigned NOT NULL DEFAULT 0,
+    ADD COLUMN `chunks_done` int(11) unsigned NOT NULL DEFAULT 0,
+    ADD COLUMN `chunks_failed` int(11) unsigned NOT NULL DEFAULT 0;
@@ -2,6 +2,7 @@ import uuid
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.dispatch import receiver
 
 import commonware.log
 from tower import ugettext_lazy as _lazy
@@ -266,6 +267,16 @@ class AddonPaymentAccount(amo.models.ModelBase):
         super(AddonPaymentAccount, self).delete()
 
 
+@receiver(models.signals.post_save, sender=AddonPaymentAccount,
+          dispatch_uid='app_dict_save_addonpaymentaccount')
+@receiver(models.signals.post_delete, sender=AddonPaymentAccount,
+          dispatch_uid='app_dict_delete_addonpaymentaccount')
+def invalidate_app_dict(sender, instance, **kw):
+    # Circular import.
+    from mkt.webapps.utils import invalidate_app_dict
+    invalidate_app_dict(instance.addon_id)
+
+
 class UserInappKey(amo.models.ModelBase):
     solitude_seller = models.ForeignKey(SolitudeSeller)
     seller_product_pk = models.IntegerField(unique=True)
@@ -98,8 +98,6 @@ class PaymentTest(InappPaymentUtil, amo.tests.TestCase):
         cfg.set_private_key(self.app_secret)
         self.app.paypal_id = 'app-dev-paypal@theapp.com'
         self.app.save()
-        if hasattr(Price, '_currencies'):
-            del Price._currencies  # needed to pick up fixtures.
 
     def get_app(self):
         return Addon.objects.get(pk=337141)
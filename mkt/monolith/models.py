@@ -1,10 +1,19 @@
+import atexit
 import datetime
 import hashlib
 import json
+import logging
+import os
+import threading
+import time
 
+from django.conf import settings
 from django.db import models
 
 
+log = logging.getLogger('z.monolith')
+
+
 class MonolithRecord(models.Model):
     """Data stored temporarily for monolith.
 
@@ -21,6 +30,79 @@ class MonolithRecord(models.Model):
         db_table = 'monolith_record'
 
 
+class RecordBuffer(object):
+    """
+    Keeps MonolithRecords in memory and inserts them in bulk from a
+    background thread. Records are written when MONOLITH_BUFFER_SIZE of them
+    are waiting, every MONOLITH_BUFFER_TIMEOUT seconds, and when the process
+    exits.
+    """
+
+    def __init__(self):
+        self._records = []
+        self._lock = threading.Lock()
+        # Set to have the thread flush before the timeout is up.
+        self._wake = threading.Event()
+        # The process the flushing thread runs in.
+        self._pid = None
+        # A lock per process to start the thread with. The other locks are
+        # copied by fork() in whatever state they were in, so they can't be
+        # trusted in a child until they have been replaced.
+        self._start_locks = {}
+
+    def add(self, record):
+        self._start()
+        with self._lock:
+            self._records.append(record)
+            full = len(self._records) >= settings.MONOLITH_BUFFER_SIZE
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        if self._pid != os.getpid():
+            # Nothing was buffered in this process.
+            return
+        with self._lock:
+            records, self._records = self._records, []
+        if not records:
+            return
+        try:
+            MonolithRecord.objects.bulk_create(records)
+        except Exception:
+            log.exception('Could not write %s monolith records'
+                          % len(records))
+
+    def _start(self):
+        """Starts the flushing thread once in each process."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        # setdefault is atomic, so every thread gets the same new lock.
+        with self._start_locks.setdefault(pid, threading.Lock()):
+            if self._pid == pid:
+                return
+            # Records copied from the parent process are the parent's to
+            # write.
+            self._lock = threading.Lock()
+            self._wake = threading.Event()
+            self._records = []
+            thread = threading.Thread(target=self._run,
+                                      name='monolith-record-buffer')
+            thread.daemon = True
+            thread.start()
+            self._pid = pid
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.MONOLITH_BUFFER_TIMEOUT)
+            self._wake.clear()
+            self.flush()
+
+
+record_buffer = RecordBuffer()
+atexit.register(record_buffer.flush)
+
+
 def get_user_hash(request):
     """Get a hash identifying an user.
 
@@ -57,5 +139,9 @@ def record_stat(key, request, **data):
 
     record = MonolithRecord(key=key, user_hash=get_user_hash(request),
                             recorded=recorded, value=json.dumps(data))
-    record.save()
+    if settings.MONOLITH_BUFFER_SIZE:
+        # It has no id until the buffer is flushed.
+        record_buffer.add(record)
+    else:
+        record.save()
     return record
@@ -1,8 +1,13 @@
 import logging
 import json
+from urllib import urlencode
 
+from django.conf import settings
 from django.db import transaction
 
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
+
 from mkt.api.authentication import OAuthAuthentication
 from mkt.api.authorization import PermissionAuthorization
 from mkt.api.base import MarketplaceModelResource
@@ -11,6 +16,47 @@ from .models import MonolithRecord
 
 logger = logging.getLogger('z.monolith')
 
+# How many records obj_delete_list deletes in each transaction.
+DELETE_CHUNK_SIZE = 1000
+
+
+class KeysetPaginator(Paginator):
+    """
+    Pages through the records in id order from after the `last_id` in the
+    request, start with `last_id=0`. Every page is found with the id index,
+    however far in it is, and there is no COUNT of the whole table, so the
+    `meta` of these pages has no `offset` or `total_count`. Requests without
+    a `last_id` are paged as usual.
+    """
+
+    def page(self):
+        if 'last_id' not in self.request_data:
+            return super(KeysetPaginator, self).page()
+
+        # No limit would mean the whole table, use the default instead.
+        limit = self.get_limit() or getattr(settings, 'API_LIMIT_PER_PAGE', 20)
+        last_id = self.request_data['last_id']
+        try:
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise BadRequest("Invalid last_id '%s' provided. Please provide "
+                             "an integer." % last_id)
+
+        objects = list(self.objects.filter(id__gt=last_id)
+                                   .order_by('id')[:limit])
+        meta = {'limit': limit, 'previous': None, 'next': None}
+        if len(objects) == limit:
+            meta['next'] = self.get_next_after(limit, objects[-1].id)
+        return {self.collection_name: objects, 'meta': meta}
+
+    def get_next_after(self, limit, last_id):
+        if self.resource_uri is None:
+            return None
+        params = dict(self.request_data.items())
+        params.pop('offset', None)
+        params.update(limit=limit, last_id=last_id)
+        return '%s?%s' % (self.resource_uri, urlencode(params))
+
 
 class MonolithData(MarketplaceModelResource):
 
@@ -23,13 +69,24 @@ class MonolithData(MarketplaceModelResource):
                      'id': ['lte', 'gte']}
         authorization = PermissionAuthorization('Monolith', 'API')
         authentication = OAuthAuthentication()
+        paginator_class = KeysetPaginator
 
-    @transaction.commit_on_success
     def obj_delete_list(self, request=None, **kwargs):
         filters = self.build_filters(request.GET)
         qs = self.get_object_list(request).filter(**filters)
-        logger.info('deleting %d monolith resources' % qs.count())
-        qs.delete()
+        # Delete in id order a chunk at a time, each in its own transaction,
+        # so the table isn't locked for the whole of a large delete.
+        deleted = last_id = 0
+        while True:
+            ids = list(qs.filter(id__gt=last_id).order_by('id')
+                         .values_list('id', flat=True)[:DELETE_CHUNK_SIZE])
+            if not ids:
+                break
+            with transaction.commit_on_success():
+                MonolithRecord.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            last_id = ids[-1]
+        logger.info('deleted %d monolith resources' % deleted)
 
     def dehydrate_value(self, bundle):
         return json.loads(bundle.data['value'])
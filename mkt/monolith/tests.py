@@ -1,17 +1,21 @@
 from collections import namedtuple
 import datetime
 import json
+import os
 import uuid
 
-from nose.tools import eq_
+import mock
+from nose.tools import eq_, ok_
 
+from django.conf import settings
 from django.test import client
 
 from amo.tests import TestCase
 from mkt.api.tests.test_oauth import BaseOAuth
 from mkt.site.fixtures import fixture
 
-from .models import record_stat, MonolithRecord
+from .models import (record_buffer, record_stat, MonolithRecord,
+                     RecordBuffer)
 
 
 class RequestFactory(client.RequestFactory):
@@ -62,6 +66,45 @@ class TestModels(TestCase):
         with self.assertRaises(ValueError):
             record_stat('app.install', self.request)
 
+    @mock.patch.object(settings, 'MONOLITH_BUFFER_SIZE', 2)
+    @mock.patch.object(record_buffer, '_start')
+    def test_record_stat_buffered(self, _start):
+        record_buffer._pid = os.getpid()
+        record_buffer._wake.clear()
+        record_stat('app.install', self.request, value=1)
+        assert not record_buffer._wake.is_set()
+        record_stat('app.install', self.request, value=2)
+        # The full buffer is left to the thread.
+        assert record_buffer._wake.is_set()
+        eq_(MonolithRecord.objects.count(), 0)
+        record_buffer.flush()
+        eq_(sorted(r.value for r in MonolithRecord.objects.all()),
+            [json.dumps({'value': 1}), json.dumps({'value': 2})])
+
+    @mock.patch.object(settings, 'MONOLITH_BUFFER_SIZE', 10)
+    @mock.patch.object(record_buffer, '_start')
+    def test_record_buffer_flush(self, _start):
+        record_buffer._pid = os.getpid()
+        record_stat('app.install', self.request, value=1)
+        record_buffer.flush()
+        eq_(MonolithRecord.objects.count(), 1)
+        record_buffer.flush()
+        eq_(MonolithRecord.objects.count(), 1)
+
+    @mock.patch('mkt.monolith.models.threading.Thread')
+    def test_record_buffer_after_fork(self, thread):
+        buf = RecordBuffer()
+        buf._pid = -1
+        buf._records = ['from the parent']
+        # The parent's thread was flushing when it forked.
+        buf._lock.acquire()
+        buf.flush()
+        buf._start()
+        assert thread.return_value.start.called
+        eq_(buf._pid, os.getpid())
+        eq_(buf._records, [])
+        assert not buf._lock.locked()
+
 
 class TestMonolithResource(BaseOAuth):
     fixtures = fixture('user_2519')
@@ -94,6 +137,8 @@ class TestMonolithResource(BaseOAuth):
 
         # we also want to test that the data is correct JSON
         eq_(data['objects'][0]['value']['value'], 2)
+        eq_(data['meta']['offset'], 0)
+        eq_(data['meta']['total_count'], 1)
 
     def test_filter_by_date(self):
         for id_, date in enumerate((self.last_week, self.yesterday, self.now)):
@@ -127,6 +172,40 @@ class TestMonolithResource(BaseOAuth):
         eq_(res.status_code, 204)
         eq_(MonolithRecord.objects.count(), 1)
 
+    def test_keyset_pagination(self):
+        for value in range(3):
+            record_stat('app.install', self.request, value=value)
+        ids = list(MonolithRecord.objects.order_by('id')
+                                         .values_list('id', flat=True))
+
+        res = self.client.get(self.list_url, data={'limit': 2, 'last_id': 0})
+        eq_(res.status_code, 200)
+        data = json.loads(res.content)
+        eq_([obj['id'] for obj in data['objects']], ids[:2])
+        ok_('last_id=%s' % ids[1] in data['meta']['next'])
+        ok_('total_count' not in data['meta'])
+
+        res = self.client.get(self.list_url,
+                              data={'limit': 2, 'last_id': ids[1]})
+        data = json.loads(res.content)
+        eq_([obj['id'] for obj in data['objects']], ids[2:])
+        eq_(data['meta']['next'], None)
+
+    def test_keyset_pagination_bad_last_id(self):
+        res = self.client.get(self.list_url, data={'last_id': 'x'})
+        eq_(res.status_code, 400)
+
+    @mock.patch('mkt.monolith.resources.DELETE_CHUNK_SIZE', 1)
+    def test_deletion_in_chunks(self):
+        for date in (self.last_week, self.yesterday, self.now):
+            record_stat('app.install', self.request, __recorded=date, value=1)
+        record_stat('foo.bar', self.request, __recorded=self.now, value=1)
+
+        res = self.client.delete(self.list_url, data={'key': 'app.install'})
+        eq_(res.status_code, 204)
+        eq_(list(MonolithRecord.objects.values_list('key', flat=True)),
+            ['foo.bar'])
+
     def test_deletion_by_id(self):
         record_stat('app.install', self.request, __recorded=self.now, value=1)
         records = MonolithRecord.objects.all()
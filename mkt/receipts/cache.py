@@ -0,0 +1,18 @@
+"""
+Cache keys for the install and purchase lookups done when verifying a
+receipt. These are used by services/verify.py to cache the lookups and by
+the Installed and AddonPurchase signal handlers to invalidate them, so this
+module must stay free of Django models.
+"""
+import hashlib
+
+
+def install_key(addon_id, uuid):
+    # The uuid comes from the receipt, so hash it to get a safe key.
+    if isinstance(uuid, unicode):
+        uuid = uuid.encode('utf-8')
+    return 'verify:install:%s:%s' % (addon_id, hashlib.md5(uuid).hexdigest())
+
+
+def purchase_key(addon_id, user_id):
+    return 'verify:purchase:%s:%s' % (addon_id, user_id)
@@ -64,6 +64,9 @@ class TestVerify(amo.tests.TestCase):
     fixtures = fixture('webapp_337141', 'user_999')
 
     def setUp(self):
+        verify.key_cache.clear()
+        verify.lookup_cache.clear()
+        verify.receipt_cache.clear()
         self.addon = Addon.objects.get(pk=337141)
         self.user = UserProfile.objects.get(pk=999)
         self.user_data = {'user': {'type': 'directed-identifier',
@@ -250,6 +253,29 @@ class TestVerify(amo.tests.TestCase):
             res = self.get(self.user_data)
             eq_(res['status'], 'refunded')
 
+    def test_lookups_cached(self):
+        self.addon.update(premium_type=amo.ADDON_PREMIUM)
+        self.make_install()
+        self.make_purchase()
+        eq_(self.get(self.user_data)['status'], 'ok')
+        with self.assertNumQueries(0):
+            eq_(self.get(self.user_data)['status'], 'ok')
+
+    def test_refund_clears_cache(self):
+        self.addon.update(premium_type=amo.ADDON_PREMIUM)
+        self.make_install()
+        self.make_purchase()
+        eq_(self.get(self.user_data)['status'], 'ok')
+        verify.lookup_cache.clear()
+        self.make_contribution(type=amo.CONTRIB_REFUND)
+        eq_(self.get(self.user_data)['status'], 'refunded')
+
+    def test_missing_install_cached(self):
+        eq_(self.get(self.user_data)['status'], 'invalid')
+        verify.lookup_cache.clear()
+        self.make_install()
+        eq_(self.get(self.user_data)['status'], 'ok')
+
     def test_premium_no_charge(self):
         self.addon.update(premium_type=amo.ADDON_PREMIUM)
         self.make_install()
@@ -316,6 +342,27 @@ class TestVerify(amo.tests.TestCase):
         self.assertRaises(M2Crypto.RSA.RSAError, verify.decode_receipt,
                           receipt + 'x')
 
+    def test_receipt_cached(self):
+        self.addon.update(type=amo.ADDON_WEBAPP, manifest_url='http://a.com')
+        receipt = create_receipt(self.make_install())
+        result = verify.decode_receipt(receipt)
+        result['typ'] = 'changed'
+        with mock.patch('services.verify.jwt.decode') as decode:
+            eq_(verify.decode_receipt(receipt)['typ'], u'purchase-receipt')
+            assert not decode.called
+
+    @mock.patch('services.verify.receipts.certs.ReceiptVerifier')
+    def test_verifier_cached(self, trunion_verify):
+        verify.get_verifier()
+        verify.get_verifier()
+        eq_(trunion_verify.call_count, 1)
+
+    def test_key_cached(self):
+        with mock.patch('services.verify.jwt.rsa_load') as rsa_load:
+            verify.get_key()
+            verify.get_key()
+            eq_(rsa_load.call_count, 1)
+
     @mock.patch.object(verify, 'decode_receipt')
     def get_headers(self, decode_receipt):
         decode_receipt.return_value = ''
@@ -333,8 +380,70 @@ class TestVerify(amo.tests.TestCase):
         assert ('Cache-Control', 'no-cache') in hdrs, 'No cache header needed'
 
 
+@mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_URL', 'http://foo.com')
+class TestBatchVerify(amo.tests.TestCase):
+    fixtures = fixture('webapp_337141', 'user_999')
+
+    def setUp(self):
+        self.addon = Addon.objects.get(pk=337141)
+        self.user = UserProfile.objects.get(pk=999)
+        self.install = Installed.objects.create(addon=self.addon,
+                                                user=self.user)
+        self.install.update(uuid='some-uuid')
+
+    def receipt(self, uuid='some-uuid', addon_id=337141):
+        return {'user': {'type': 'directed-identifier', 'value': uuid},
+                'product': {'url': 'http://f.com',
+                            'storedata': urlencode({'id': addon_id})},
+                'verify': 'https://foo.com/verifyme/',
+                'exp': calendar.timegm(time.gmtime()) + 1000,
+                'typ': 'purchase-receipt'}
+
+    @mock.patch.object(verify, 'decode_receipt')
+    def get(self, receipts, decode_receipt):
+        decode_receipt.side_effect = receipts
+        environ = RequestFactory().post('/verifyme/').META
+        batch = verify.BatchVerify([''] * len(receipts), environ)
+        batch.cursor = connection.cursor()
+        return [r['status'] for r in json.loads(batch.check_full())]
+
+    def test_statuses_in_order(self):
+        eq_(self.get([self.receipt(), self.receipt(uuid='nope'),
+                      self.receipt(addon_id=123)]),
+            ['ok', 'invalid', 'invalid'])
+
+    def test_undecodable(self):
+        eq_(self.get([ValueError, self.receipt()]), ['invalid', 'ok'])
+
+    def test_premium(self):
+        self.addon.update(premium_type=amo.ADDON_PREMIUM)
+        other = UserProfile.objects.create(email='other@mozilla.com')
+        install = Installed.objects.create(addon=self.addon, user=other)
+        install.update(uuid='other-uuid')
+        purchase = AddonPurchase.objects.create(addon=self.addon, user=other)
+        purchase.update(type=amo.CONTRIB_REFUND)
+        eq_(self.get([self.receipt(), self.receipt(uuid='other-uuid')]),
+            ['invalid', 'refunded'])
+
+    def test_queries(self):
+        receipts = [self.receipt() for x in range(10)]
+        with self.assertNumQueries(1):
+            eq_(self.get(receipts), ['ok'] * 10)
+
+    def test_application(self):
+        environ = RequestFactory().post('/verifyme/batch/').META
+        environ['wsgi.input'] = mock.Mock()
+        environ['wsgi.input'].read.return_value = 'not json'
+        start_response = mock.Mock()
+        verify.application(environ, start_response)
+        eq_(start_response.call_args[0][0], '400 Bad Request')
+
+
 class TestBase(amo.tests.TestCase):
 
+    def setUp(self):
+        verify.receipt_cache.clear()
+
     def create(self, data, request=None):
         stuff = {'user': {'type': 'directed-identifier'}}
         stuff.update(data)
@@ -369,6 +478,7 @@ class TestType(TestBase):
 class TestURL(TestBase):
 
     def setUp(self):
+        super(TestURL, self).setUp()
         self.req = RequestFactory().post('/foo').META
 
     def test_wrong_domain(self):
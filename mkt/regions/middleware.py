@@ -2,6 +2,7 @@ from django.conf import settings
 from django.utils.cache import patch_vary_headers
 
 from lib.geoip import GeoIP
+from users.tasks import update_user_region
 
 import mkt
 
@@ -11,13 +12,50 @@ class RegionMiddleware(object):
 
     def __init__(self):
         self.geoip = GeoIP(settings)
+        # The first region with each default language, the same without the
+        # first region, which is worldwide.
+        self.default_languages = {}
+        self.default_languages_other = {}
+        for i, (name, region) in enumerate(mkt.regions.REGIONS_CHOICES):
+            self.default_languages.setdefault(region.default_language,
+                                              region.slug)
+            if i:
+                self.default_languages_other.setdefault(
+                    region.default_language, region.slug)
+        # The region of each request.LANG seen so far.
+        self.lang_regions = {}
 
     def region_from_request(self, request):
         ip_reg = self.geoip.lookup(request.META.get('REMOTE_ADDR'))
-        for name, region in mkt.regions.REGIONS_CHOICES:
-            if ip_reg == name:
-                return region.slug
-        return mkt.regions.WORLDWIDE.slug
+        region = mkt.regions.REGIONS_DICT.get(ip_reg)
+        return region.slug if region else mkt.regions.WORLDWIDE.slug
+
+    def region_from_lang(self, lang):
+        """Returns the region of a language, worldwide if there isn't one."""
+        try:
+            return self.lang_regions[lang]
+        except KeyError:
+            pass
+
+        reg = mkt.regions.WORLDWIDE.slug
+        if lang == settings.LANGUAGE_CODE:
+            choices = mkt.regions.REGIONS_CHOICES[1:]
+            default_languages = self.default_languages_other
+        else:
+            choices = mkt.regions.REGIONS_CHOICES
+            default_languages = self.default_languages
+        if lang:
+            for name, region in choices:
+                if name.lower() in lang.lower():
+                    reg = region.slug
+                    break
+        # All else failed, try to match against our forced Language.
+        if reg == mkt.regions.WORLDWIDE.slug:
+            # Try to find a suitable region.
+            reg = default_languages.get(lang, reg)
+
+        self.lang_regions[lang] = reg
+        return reg
 
     def process_request(self, request):
         regions = mkt.regions.REGIONS_DICT
@@ -36,22 +74,7 @@ class RegionMiddleware(object):
             reg = self.region_from_request(request)
             # If the above fails, let's try `Accept-Language`.
             if reg == worldwide:
-                if request.LANG == settings.LANGUAGE_CODE:
-                    choices = mkt.regions.REGIONS_CHOICES[1:]
-                else:
-                    choices = mkt.regions.REGIONS_CHOICES
-                if request.LANG:
-                    for name, region in choices:
-                        if name.lower() in request.LANG.lower():
-                            reg = region.slug
-                            break
-                # All else failed, try to match against our forced Language.
-                if reg == mkt.regions.WORLDWIDE.slug:
-                    # Try to find a suitable region.
-                    for name, region in choices:
-                        if region.default_language == request.LANG:
-                            reg = region.slug
-                            break
+                reg = self.region_from_lang(request.LANG)
 
                 a_l = request.META.get('HTTP_ACCEPT_LANGUAGE')
                 if (reg == 'us' and a_l is not None
@@ -63,8 +86,9 @@ class RegionMiddleware(object):
         if reg != stored_reg:
             if (getattr(request, 'amo_user', None)
                 and request.amo_user.region != reg):
+                # Only the region changed, don't save the whole profile.
                 request.amo_user.region = reg
-                request.amo_user.save()
+                update_user_region.delay(request.amo_user.pk, reg)
             if not getattr(request, 'API', False):
                 request.set_cookie('region', reg)
 
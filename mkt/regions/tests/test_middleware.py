@@ -9,6 +9,7 @@ import amo.tests
 from users.models import UserProfile
 
 import mkt
+from mkt.regions.middleware import RegionMiddleware
 from mkt.site.fixtures import fixture
 
 
@@ -94,6 +95,14 @@ class TestRegionMiddleware(amo.tests.TestCase):
             eq_(got, expected,
                 'For %r: expected %r but got %r' % (locale, expected, got))
 
+    def test_region_from_lang(self):
+        middleware = RegionMiddleware()
+        eq_(middleware.region_from_lang('pt-BR'), 'br')
+        eq_(middleware.region_from_lang('de'), 'de')
+        eq_(middleware.region_from_lang('fr'), 'worldwide')
+        eq_(middleware.region_from_lang(settings.LANGUAGE_CODE), 'us')
+        eq_(middleware.lang_regions['pt-BR'], 'br')
+
     @mock.patch('mkt.regions.middleware.RegionMiddleware.region_from_request')
     def test_url_param_override(self, mock_rfr):
         self.client.cookies['lang'] = 'pt-BR'
@@ -173,3 +182,9 @@ class TestRegionMiddlewarePersistence(amo.tests.TestCase):
         self.client.login(username='regular@mozilla.com', password='password')
         self.client.get('/robots.txt?region=br')
         eq_(UserProfile.objects.get(pk=999).region, 'br')
+
+    @mock.patch('mkt.regions.middleware.update_user_region')
+    def test_save_region_deferred(self, update_user_region):
+        self.client.login(username='regular@mozilla.com', password='password')
+        self.client.get('/robots.txt?region=br')
+        update_user_region.delay.assert_called_with(999, 'br')
@@ -22,7 +22,8 @@ from mkt.constants.features import FeatureProfile
 from mkt.search.views import _filter_search, _get_query
 from mkt.search.forms import ApiSearchForm
 from mkt.webapps.models import Webapp
-from mkt.webapps.utils import es_app_to_dict, update_with_reviewer_data
+from mkt.webapps.utils import (es_app_related, es_app_to_dict,
+                               update_with_reviewer_data)
 
 
 class SearchResource(CORSResource, MarketplaceResource):
@@ -101,6 +102,10 @@ class SearchResource(CORSResource, MarketplaceResource):
             objs.append(self.build_bundle(obj=obj, request=request))
 
         if uses_es:
+            # Look up what the page needs from the database all at once.
+            related = es_app_related(page['objects'], reviewer=is_reviewer)
+            for bundle in objs:
+                bundle.related = related
             page['objects'] = [self.full_dehydrate(bundle)
                                for bundle in objs]
         else:
@@ -115,20 +120,21 @@ class SearchResource(CORSResource, MarketplaceResource):
     def dehydrate(self, bundle):
         obj = bundle.obj
         amo_user = getattr(bundle.request, 'amo_user', None)
+        related = getattr(bundle, 'related', None)
 
         uses_es = waffle.switch_is_active('search-api-es')
 
         if uses_es:
             bundle.data.update(es_app_to_dict(
                 obj, region=bundle.request.REGION.id,
-                profile=amo_user))
+                profile=amo_user, related=related))
         else:
             bundle = AppResource().dehydrate(bundle)
             bundle.data['absolute_url'] = absolutify(
                 bundle.obj.get_detail_url())
 
         # Add extra data for reviewers. Used in reviewer tool search.
-        bundle = update_with_reviewer_data(bundle)
+        bundle = update_with_reviewer_data(bundle, related=related)
 
         return bundle
 
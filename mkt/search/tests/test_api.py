@@ -429,6 +429,18 @@ class TestApiReviewer(BaseOAuth, ESTestCase):
         eq_(obj['status'], amo.STATUS_PUBLIC)
         eq_(obj['latest_version_status'], amo.STATUS_PUBLIC)
 
+    def test_latest_version_status_pending_update(self):
+        # Reviewers see the status of the latest version, not the current.
+        amo.tests.version_factory(addon=self.webapp,
+                                  file_kw={'status': amo.STATUS_PENDING})
+        self.webapp.save()
+        self.refresh('webapp')
+        res = self.client.get(self.url)
+        eq_(res.status_code, 200)
+        obj = res.json['objects'][0]
+        eq_(obj['status'], amo.STATUS_PUBLIC)
+        eq_(obj['latest_version_status'], amo.STATUS_PENDING)
+
     def test_addon_type_reviewer(self):
         res = self.client.get(self.url + ({'type': 'app'},))
         eq_(res.status_code, 200)
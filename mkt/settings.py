@@ -229,6 +229,15 @@ MINIFY_MOZMARKET = True
 GEOIP_URL = ''
 GEOIP_DEFAULT_VAL = 'worldwide'
 GEOIP_DEFAULT_TIMEOUT = .2
+# A CSV file of IPv4 ranges and their countries to look addresses up in
+# instead of asking the GeoIP server. It is reloaded when it changes, which
+# is checked every GEOIP_RELOAD_INTERVAL seconds.
+GEOIP_PATH = ''
+GEOIP_RELOAD_INTERVAL = 60
+# How many addresses resolved by the GeoIP server each process remembers,
+# and for how long.
+GEOIP_CACHE_SIZE = 10000
+GEOIP_CACHE_TIMEOUT = 60 * 60
 
 # A smaller range of languages for the Marketplace.
 AMO_LANGUAGES = ('de', 'en-US', 'es', 'fr', 'pl', 'pt-BR')
@@ -1,5 +1,6 @@
 import datetime
 
+from django.conf import settings
 from django.core.management import call_command
 
 import commonware.log
@@ -16,7 +17,8 @@ cron_log = commonware.log.getLogger('mkt.cron')
 
 @cronjobs.register
 def index_latest_mkt_stats(index=None, aliased=True):
-    raise_if_reindex_in_progress()
+    # Contributions and installs share the stats alias.
+    raise_if_reindex_in_progress(settings.ES_INDEXES['stats_contributions'])
     yesterday = datetime.date.today() - datetime.timedelta(days=1)
 
     try:
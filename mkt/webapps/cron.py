@@ -10,21 +10,23 @@ from django.db.models import Count
 import commonware.log
 import cronjobs
 from celery.task.sets import TaskSet
-from lib.es.utils import raise_if_reindex_in_progress
 
 import amo
 from amo.utils import chunked
 
 from .models import Installed
-from .tasks import webapp_update_weekly_downloads
+from .tasks import flush_index_queue, webapp_update_weekly_downloads
 
 log = commonware.log.getLogger('z.cron')
 
 
 @cronjobs.register
 def update_weekly_downloads():
-    """Update the weekly "downloads" from the users_install table."""
-    raise_if_reindex_in_progress()
+    """Update the weekly "downloads" from the users_install table.
+
+    This can run during a reindex, the apps it saves are written to both
+    indexes and caught up before the alias is swapped.
+    """
     interval = datetime.today() - timedelta(days=7)
     counts = (Installed.objects.values('addon')
                                .filter(created__gte=interval,
@@ -36,6 +38,12 @@ def update_weekly_downloads():
     TaskSet(ts).apply_async()
 
 
+@cronjobs.register
+def flush_webapps_index_queue():
+    """Index any queued apps whose scheduled flush was lost."""
+    flush_index_queue()
+
+
 @cronjobs.register
 def clean_old_signed(seconds=60 * 60):
     """Clean out apps signed for reviewers."""
@@ -0,0 +1,39 @@
+import datetime
+import os
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mkt.webapps.tasks import export_apps
+
+
+HELP = """\
+Export all public apps, as the API shows them, to a gzipped file with one
+JSON app per line.
+
+The file defaults to DUMPED_APPS_PATH/exports/<date>.json.gz. An interrupted
+export is picked up where it stopped when run again with the same file. To
+append the apps after an id instead:
+
+    `--since=1234`
+"""
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--file', help='The file to write to.'),
+        make_option('--since', type='int',
+                    help='Only export the apps after this id.'),
+        make_option('--chunk-size', type='int', default=100,
+                    help='How many apps to serialize at a time.'),
+    )
+
+    help = HELP
+
+    def handle(self, *args, **kw):
+        target_file = kw['file'] or os.path.join(
+            settings.DUMPED_APPS_PATH, 'exports',
+            datetime.date.today().strftime('%Y-%m-%d') + '.json.gz')
+        export_apps(target_file, since=kw['since'],
+                    chunk_size=kw['chunk_size'])
@@ -26,14 +26,15 @@ import amo
 import amo.models
 from access.acl import action_allowed, check_reviewer
 from addons import query
-from addons.models import (Addon, AddonDeviceType, attach_categories,
+from addons.models import (Addon, AddonCategory, AddonDeviceType,
+                           AddonUpsell, AddonUser, attach_categories,
                            attach_devices, attach_prices, attach_translations,
-                           Category,
+                           Category, Preview,
                            update_search_index as amo_update_search_index)
 from addons.signals import version_changed
 from amo.decorators import skip_cache
 from amo.helpers import absolutify
-from amo.search import TempS
+from amo.search import analyze_translations, TempS
 from amo.storage_utils import copy_stored_file
 from amo.urlresolvers import reverse
 from amo.utils import JSONEncoder, memoize, memoize_key, smart_path
@@ -42,14 +43,15 @@ from files.models import File, nfd_str, Platform
 from files.utils import parse_addon, WebAppParser
 from lib.crypto import packaged
 from market.models import AddonPremium
-from stats.models import ClientData
 from translations.fields import save_signal
 from versions.models import Version
 
 import mkt
 from mkt.constants import APP_FEATURES, APP_IMAGE_SIZES, apps
+from mkt.receipts.cache import install_key
 from mkt.search.utils import S
-from mkt.webapps.utils import get_locale_properties, get_supported_locales
+from mkt.webapps.utils import (get_locale_properties, get_supported_locales,
+                               invalidate_app_dict)
 from mkt.zadmin.models import FeaturedApp
 
 
@@ -998,6 +1000,7 @@ class WebappIndexer(MappingType, Indexable):
                     # Turn off analysis on name so we can sort by it.
                     'name_sort': {'type': 'string', 'index': 'not_analyzed'},
                     'owners': {'type': 'long'},
+                    'payment_account': {'type': 'long', 'index': 'no'},
                     'popularity': {'type': 'long'},
                     'premium_type': {'type': 'byte'},
                     'previews': {
@@ -1061,24 +1064,130 @@ class WebappIndexer(MappingType, Indexable):
         """Extracts the ElasticSearch index document for this instance."""
         if obj is None:
             obj = cls.get_model().uncached.get(pk=pk)
+        return cls.extract_documents([obj])[0]
 
-        version = obj.current_version
-        try:
-            file_ = version and version.files.latest()
-        except ObjectDoesNotExist:
-            file_ = None
+    @classmethod
+    def extract_documents(cls, objs):
+        """
+        Extracts the ElasticSearch index documents for a chunk of apps.
+
+        Each related table is queried once for the whole chunk, so indexing
+        a chunk costs the same number of queries however many apps are in it.
+        """
+        related = cls.get_related(objs)
+        return [cls._extract_document(obj, related) for obj in objs]
+
+    @classmethod
+    def get_related(cls, objs):
+        """
+        Returns a dict of what the documents of `objs` need from related
+        tables, each keyed by app or version id.
+        """
+        # Circular import.
+        from mkt.developers.models import AddonPaymentAccount
+
+        ids = [obj.id for obj in objs]
+        related = dict((k, {}) for k in (
+            'authors', 'content_ratings', 'excluded_regions', 'features',
+            'files', 'installs', 'owners', 'payment_accounts', 'previews',
+            'price_tiers', 'region_installs', 'upsells', 'versions'))
+
+        version_ids = [obj._current_version_id for obj in objs
+                       if obj._current_version_id]
+        for version in Version.objects.no_cache().filter(id__in=version_ids):
+            related['versions'][version.id] = version
+
+        # Keep the most recent file of each version.
+        files = (File.objects.no_cache().filter(version__in=version_ids)
+                                        .order_by('created'))
+        for file_ in files:
+            related['files'][file_.version_id] = file_
+
+        for features in AppFeatures.objects.filter(version__in=version_ids):
+            related['features'][features.version_id] = features.to_dict()
+
+        # Count the installs in the database, popular apps have millions.
+        installs = (Installed.objects.filter(addon__in=ids)
+                    .values('addon', 'client_data__region').order_by()
+                    .annotate(count=models.Count('id')))
+        for row in installs:
+            addon_id, region = row['addon'], row['client_data__region']
+            related['installs'][addon_id] = (
+                related['installs'].get(addon_id, 0) + row['count'])
+            if region is not None:
+                related['region_installs'].setdefault(addon_id, {})[region] = (
+                    row['count'])
+
+        for cr in ContentRating.objects.filter(addon__in=ids):
+            related['content_ratings'].setdefault(cr.addon_id, {})[
+                cr.get_body().name] = {
+                    'name': cr.get_rating().name,
+                    'description': unicode(cr.get_rating().description)}
+
+        authors = (AddonUser.objects.no_cache().filter(addon__in=ids)
+                   .select_related('user').order_by('position'))
+        for au in authors:
+            if au.listed:
+                related['authors'].setdefault(au.addon_id, []).append(
+                    au.user.name)
+            if au.role == amo.AUTHOR_ROLE_OWNER:
+                related['owners'].setdefault(au.addon_id, []).append(
+                    au.user_id)
+
+        for p in Preview.objects.filter(addon__in=ids):
+            related['previews'].setdefault(p.addon_id, []).append({
+                'filetype': p.filetype,
+                'caption': unicode(p.caption),
+                'image_url': p.image_url,
+                'thumbnail_url': p.thumbnail_url})
+
+        premiums = (AddonPremium.objects.filter(addon__in=ids)
+                    .select_related('price'))
+        for premium in premiums:
+            related['price_tiers'][premium.addon_id] = (
+                premium.price.name if premium.price else None)
+
+        accounts = (AddonPaymentAccount.objects.filter(addon__in=ids)
+                    .values_list('addon', 'payment_account'))
+        related['payment_accounts'] = dict(accounts)
+
+        excluded = (AddonExcludedRegion.objects.filter(addon__in=ids)
+                    .values_list('addon', 'region'))
+        for addon_id, region in excluded:
+            related['excluded_regions'].setdefault(addon_id, []).append(region)
+
+        upsells = (AddonUpsell.objects.filter(free__in=ids)
+                   .select_related('premium'))
+        for upsell in upsells:
+            premium = upsell.premium
+            related['upsells'][upsell.free_id] = {
+                'id': premium.id,
+                'app_slug': premium.app_slug,
+                'icon_url': premium.get_icon_url(128),
+                # TODO: Store all localizations of upsell.name.
+                'name': unicode(premium.name),
+            }
+
+        return related
+
+    @classmethod
+    def _extract_document(cls, obj, related):
+        if obj._current_version_id:
+            version = related['versions'].get(obj._current_version_id)
+        else:
+            # This finds and saves the current version if it was never set.
+            version = obj.current_version
+        file_ = version and related['files'].get(version.id)
 
-        features = (version.features.to_dict()
-                    if version else AppFeatures().to_dict())
+        if version and version.id in related['features']:
+            features = related['features'][version.id]
+        else:
+            features = AppFeatures().to_dict()
 
         translations = obj.translations
-        installed_ids = list(Installed.objects.filter(addon=obj)
-                             .values_list('id', flat=True))
-        content_ratings = dict(
-            (cr.get_body().name, {
-                'name': cr.get_rating().name,
-                'description': unicode(cr.get_rating().description)})
-            for cr in obj.content_ratings.all())
+        installs = related['installs'].get(obj.id, 0)
+        region_installs = related['region_installs'].get(obj.id, {})
+        content_ratings = related['content_ratings'].get(obj.id)
 
         attrs = ('app_slug', 'average_daily_users', 'bayesian_rating',
                  'created', 'id', 'is_disabled', 'last_updated',
@@ -1088,7 +1197,7 @@ class WebappIndexer(MappingType, Indexable):
 
         d['app_type'] = (amo.ADDON_WEBAPP_PACKAGED if obj.is_packaged else
                          amo.ADDON_WEBAPP_HOSTED)
-        d['authors'] = [a.name for a in obj.listed_authors]
+        d['authors'] = related['authors'].get(obj.id, [])
         d['category'] = getattr(obj, 'category_ids', [])
         d['content_ratings'] = content_ratings if content_ratings else None
         if version:
@@ -1120,26 +1229,16 @@ class WebappIndexer(MappingType, Indexable):
         d['name'] = list(set(string for _, string
                              in translations[obj.name_id]))
         d['name_sort'] = unicode(obj.name).lower()
-        d['owners'] = [au.user.id for au in
-                       obj.addonuser_set.filter(role=amo.AUTHOR_ROLE_OWNER)]
-        d['popularity'] = d['_boost'] = len(installed_ids)
-        d['previews'] = [{'filetype': p.filetype,
-                          'caption': unicode(p.caption),
-                          'image_url': p.image_url,
-                          'thumbnail_url': p.thumbnail_url}
-                         for p in obj.previews.all()]
-        try:
-            p = obj.addonpremium.price
-            d['price_tier'] = p.name
-        except AddonPremium.DoesNotExist:
-            d['price_tier'] = None
-
+        d['owners'] = related['owners'].get(obj.id, [])
+        d['payment_account'] = related['payment_accounts'].get(obj.id)
+        d['popularity'] = d['_boost'] = installs
+        d['previews'] = related['previews'].get(obj.id, [])
+        d['price_tier'] = related['price_tiers'].get(obj.id)
         d['ratings'] = {
             'average': obj.average_rating,
             'count': obj.total_reviews,
         }
-        d['region_exclusions'] = list(
-            obj.addonexcludedregion.values_list('region', flat=True))
+        d['region_exclusions'] = related['excluded_regions'].get(obj.id, [])
         d['support_email'] = (unicode(obj.support_email)
                               if obj.support_email else None)
         d['support_url'] = (unicode(obj.support_url)
@@ -1150,44 +1249,31 @@ class WebappIndexer(MappingType, Indexable):
         else:
             d['supported_locales'] = []
 
-        if obj.upsell:
-            upsell_obj = obj.upsell.premium
-            d['upsell'] = {
-                'id': upsell_obj.id,
-                'app_slug': upsell_obj.app_slug,
-                'icon_url': upsell_obj.get_icon_url(128),
-                # TODO: Store all localizations of upsell.name.
-                'name': unicode(upsell_obj.name),
-            }
+        if obj.id in related['upsells']:
+            d['upsell'] = related['upsells'][obj.id]
 
         # Calculate regional popularity for "mature regions"
         # (installs + reviews/installs from that region).
-        installs = dict(ClientData.objects.filter(installed__in=installed_ids)
-                        .annotate(region_counts=models.Count('region'))
-                        .values_list('region', 'region_counts').distinct())
         for region in mkt.regions.ALL_REGION_IDS:
-            cnt = installs.get(region, 0)
+            cnt = region_installs.get(region, 0)
             if cnt:
                 # Magic number (like all other scores up in this piece).
                 d['popularity_%s' % region] = d['popularity'] + cnt * 10
             else:
-                d['popularity_%s' % region] = len(installed_ids)
+                d['popularity_%s' % region] = installs
             d['_boost'] += cnt * 10
 
         # Bump the boost if the add-on is public.
         if obj.status == amo.STATUS_PUBLIC:
             d['_boost'] = max(d['_boost'], 1) * 4
 
-        # Indices for each language. languages is a list of locales we want to
-        # index with analyzer if the string's locale matches.
-        for analyzer, languages in amo.SEARCH_ANALYZER_MAP.iteritems():
-            d['name_' + analyzer] = list(
-                set(string for locale, string in translations[obj.name_id]
-                    if locale.lower() in languages))
-            d['description_' + analyzer] = list(
-                set(string for locale, string
-                    in translations[obj.description_id]
-                    if locale.lower() in languages))
+        # Indices for each language, the strings of each field are indexed
+        # with the analyzer of their locale.
+        for field, id_ in (('name', obj.name_id),
+                           ('description', obj.description_id)):
+            analyzed = analyze_translations(translations[id_])
+            for analyzer, strings in analyzed.iteritems():
+                d['%s_%s' % (field, analyzer)] = strings
 
         return d
 
@@ -1209,7 +1295,7 @@ def update_search_index(sender, instance, **kw):
     if waffle.switch_is_active('search-api-es'):
         from . import tasks
         if not kw.get('raw'):
-            tasks.index_webapps.delay([instance.id])
+            tasks.queue_index_webapps([instance.id])
 
     # Also continue to index to old index if we enable/disable the switch.
     amo_update_search_index(sender, instance, **kw)
@@ -1317,6 +1403,32 @@ def add_uuid(sender, **kw):
             install.save()
 
 
+@receiver(models.signals.post_save, sender=Installed,
+          dispatch_uid='installed_verify_cache')
+@receiver(models.signals.post_delete, sender=Installed,
+          dispatch_uid='installed_verify_cache')
+def clear_install_verify_cache(sender, instance, **kw):
+    """Clears the cached install lookup used by receipt verification."""
+    if instance.uuid:
+        cache.delete(install_key(instance.addon_id, instance.uuid))
+
+
+@receiver(models.signals.post_save, sender=Installed,
+          dispatch_uid='installed_user_context')
+@receiver(models.signals.post_delete, sender=Installed,
+          dispatch_uid='installed_user_context')
+def clear_installed_ids(sender, instance, **kw):
+    cache.delete(memoize_key('webapps:installed-ids', instance.user_id))
+
+
+@receiver(models.signals.post_save, sender=AddonUser,
+          dispatch_uid='addonuser_user_context')
+@receiver(models.signals.post_delete, sender=AddonUser,
+          dispatch_uid='addonuser_user_context')
+def clear_developed_ids(sender, instance, **kw):
+    cache.delete(memoize_key('webapps:developed-ids', instance.user_id))
+
+
 class AddonExcludedRegion(amo.models.ModelBase):
     """
     Apps are listed in all regions by default.
@@ -1485,3 +1597,27 @@ A set of boolean values stating if an app requires a particular feature.
 
 """
 AppFeatures = type('AppFeatures', (AppFeaturesBase,), app_feature_attrs)
+
+
+def invalidate_app_dict_signal(sender, instance, **kw):
+    """Drops the cached API representation of the app `instance` is of."""
+    if isinstance(instance, Addon):
+        app_id = instance.id
+    elif isinstance(instance, AddonUpsell):
+        app_id = instance.free_id
+    elif isinstance(instance, AppFeatures):
+        app_id = instance.version.addon_id
+    else:
+        app_id = instance.addon_id
+    invalidate_app_dict(app_id)
+
+
+for _sender in (Addon, Webapp, Version, AppFeatures, AddonCategory,
+                AddonDeviceType, AddonExcludedRegion, AddonPremium,
+                AddonUpsell, AddonUser, ContentRating, ImageAsset, Preview):
+    dbsignals.post_save.connect(
+        invalidate_app_dict_signal, sender=_sender,
+        dispatch_uid='app_dict_save_%s' % _sender.__name__.lower())
+    dbsignals.post_delete.connect(
+        invalidate_app_dict_signal, sender=_sender,
+        dispatch_uid='app_dict_delete_%s' % _sender.__name__.lower())
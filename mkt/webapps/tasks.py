@@ -1,17 +1,22 @@
 import datetime
+import gzip
 import hashlib
 import json
 import logging
 import os
+import socket
 import subprocess
 from collections import defaultdict
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
 from django.db.utils import IntegrityError
 from django.forms import ValidationError
 from django.template import Context, loader
 
+import redis as redislib
+import redisutils
 from celery.exceptions import RetryTaskError
 from celeryutils import task
 from pyelasticsearch.exceptions import ElasticHttpNotFoundError
@@ -25,7 +30,7 @@ from amo.utils import chunked, JSONEncoder
 from editors.models import RereviewQueue
 from files.models import FileUpload
 from files.utils import WebAppParser
-from lib.es.utils import get_indices
+from lib.es.utils import get_indices, reindex_writes_key
 from translations.models import delete_translation, Translation
 from users.utils import get_task_user
 
@@ -268,6 +273,24 @@ def update_supported_locales(ids, **kw):
                 _log(app, u'Updating supported locales failed.', exc_info=True)
 
 
+def _record_reindex_writes(indices, ids):
+    """
+    During a reindex `indices` is the new and the old index. Remember the
+    apps written to them so reindex_mkt can replay them into the new index
+    before pointing the alias at it, in case a chunk overwrote them with
+    older data.
+    """
+    if len(indices) < 2:
+        return
+    try:
+        redis = redisutils.connections['master']
+        for id_ in ids:
+            redis.sadd(reindex_writes_key(indices[0]), id_)
+    except (redislib.RedisError, socket.error):
+        task_log.error('Could not record apps written during reindex.',
+                       exc_info=True)
+
+
 @task(acks_late=True)
 @write
 def index_webapps(ids, **kw):
@@ -277,13 +300,62 @@ def index_webapps(ids, **kw):
     # Note: If reindexing is currently occurring, `get_indices` will return
     # more than one index.
     indices = get_indices(index)
+    _record_reindex_writes(indices, ids)
 
     es = WebappIndexer.get_es(urls=settings.ES_URLS)
     qs = Webapp.indexing_transformer(Webapp.uncached.filter(id__in=ids))
-    for obj in qs:
-        doc = WebappIndexer.extract_document(obj.id, obj)
+    for doc in WebappIndexer.extract_documents(list(qs)):
         for idx in indices:
-            WebappIndexer.index(doc, id_=obj.id, es=es, index=idx)
+            WebappIndexer.index(doc, id_=doc['id'], es=es, index=idx)
+
+
+# A redis set of the ids of apps waiting to be indexed, and the cache key
+# flagging that a flush of it is scheduled.
+INDEX_QUEUE_KEY = 'mkt:webapps:index-queue'
+INDEX_FLUSH_KEY = 'mkt:webapps:index-queue-flush'
+
+
+def queue_index_webapps(ids):
+    """
+    Queue apps to be indexed within ES_INDEX_QUEUE_DELAY seconds. An app
+    queued several times before the queue is flushed is only indexed once.
+    """
+    delay = settings.ES_INDEX_QUEUE_DELAY
+    if not delay:
+        index_webapps.delay(ids)
+        return
+    try:
+        redis = redisutils.connections['master']
+        for id_ in ids:
+            redis.sadd(INDEX_QUEUE_KEY, id_)
+    except (redislib.RedisError, socket.error):
+        task_log.error('Could not queue apps for indexing.', exc_info=True)
+        index_webapps.delay(ids)
+        return
+    # Only schedule one flush for all the apps queued in that time.
+    if cache.add(INDEX_FLUSH_KEY, 1, delay):
+        flush_index_queue.apply_async(countdown=delay)
+
+
+@task
+def flush_index_queue(**kw):
+    """Index the apps queued by queue_index_webapps."""
+    # Apps queued from now on need another flush.
+    cache.delete(INDEX_FLUSH_KEY)
+    redis = redisutils.connections['master']
+    # A copy, MockRedis hands back the set it removes from.
+    queued = list(redis.smembers(INDEX_QUEUE_KEY))
+    # Only remove the ids that were read, apps queued since then are left
+    # for the next flush. The removals go in one round trip.
+    pipe = redis.pipeline()
+    for id_ in queued:
+        pipe.srem(INDEX_QUEUE_KEY, id_)
+    pipe.execute()
+    ids = sorted(int(id_) for id_ in queued)
+    if ids:
+        task_log.info('Flushing %s apps from the index queue.' % len(ids))
+    for chunk in chunked(ids, 100):
+        index_webapps.delay(chunk)
 
 
 @task(acks_late=True)
@@ -295,6 +367,7 @@ def unindex_webapps(ids, **kw):
     # Note: If reindexing is currently occurring, `get_indices` will return
     # more than one index.
     indices = get_indices(index)
+    _record_reindex_writes(indices, ids)
 
     es = WebappIndexer.get_es(urls=settings.ES_URLS)
     for id_ in ids:
@@ -367,6 +440,70 @@ def zip_apps(*args, **kw):
     return target_file
 
 
+@task
+def export_apps(target_file, since=None, chunk_size=100, **kw):
+    """
+    Writes every public app, as the API shows it, to `target_file` as gzipped
+    JSON with one app per line.
+
+    Apps are exported in id order `chunk_size` at a time and each chunk is
+    written as its own gzip member, so memory use stays the same however many
+    apps there are and the file can be read up to the last complete chunk.
+    Progress is kept in `target_file`.state: if that is there the export
+    carries on from where it stopped. Pass `since` to append the apps after
+    that id instead.
+    """
+    # Because @robhudson told me to.
+    from mkt.api.resources import AppResource
+    # Note: not using storage because all these operations should be local.
+    target_dir = os.path.dirname(target_file)
+    if target_dir and not os.path.exists(target_dir):
+        os.makedirs(target_dir)
+
+    state_file = target_file + '.state'
+    size = None
+    if since is None and os.path.exists(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+        since, size = state['last_id'], state['size']
+        task_log.info(u'Resuming app export to {0} after app {1}'
+                      .format(target_file, since))
+
+    req = RequestFactory().get('/')
+    req.REGION = WORLDWIDE
+    resource = AppResource()
+    total = 0
+
+    with open(target_file, 'ab' if since else 'wb') as fp:
+        if size is not None:
+            # Drop anything written after the last complete chunk.
+            fp.truncate(size)
+        while True:
+            apps = list(Webapp.objects.no_cache()
+                        .filter(status=amo.STATUS_PUBLIC, id__gt=since or 0)
+                        .order_by('id')[:chunk_size])
+            if not apps:
+                break
+            # GzipFile is not a context manager on Python 2.6.
+            gz = gzip.GzipFile(fileobj=fp, mode='wb')
+            try:
+                for data in resource.dehydrate_objects(apps, request=req):
+                    gz.write(json.dumps(data, cls=JSONEncoder) + '\n')
+            finally:
+                gz.close()
+            fp.flush()
+            since = apps[-1].id
+            total += len(apps)
+            with open(state_file, 'w') as f:
+                json.dump({'last_id': since, 'size': fp.tell()}, f)
+            task_log.info(u'Exported {0} apps to {1}, up to app {2}'
+                          .format(total, target_file, since))
+
+    if os.path.exists(state_file):
+        os.remove(state_file)
+    return target_file
+
+
 def _update_features(id):
     try:
         webapp = Webapp.objects.get(pk=id)
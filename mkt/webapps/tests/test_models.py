@@ -33,6 +33,7 @@ from files.tests.test_models import UploadTest as BaseUploadTest
 from files.utils import WebAppParser
 from lib.crypto import packaged
 from lib.crypto.tests import mock_sign
+from stats.models import ClientData
 from users.models import UserProfile
 from versions.models import update_status, Version
 
@@ -1445,6 +1446,31 @@ class TestWebappIndexer(amo.tests.TestCase):
         obj, doc = self._get_doc()
         self.assertSetEqual(doc['supported_locales'], set(locales.split(',')))
 
+    def test_extract_popularity(self):
+        for i, region in enumerate([None, mkt.regions.BR.id,
+                                    mkt.regions.BR.id]):
+            user = UserProfile.objects.create(email='%s@mozilla.com' % i)
+            client_data = ClientData.objects.create(
+                region=region, language='en-US', is_chromeless=False,
+                device_type='desktop', user_agent='ua-%s' % i)
+            Installed.objects.create(addon=self.app, user=user,
+                                     client_data=client_data)
+        obj, doc = self._get_doc()
+        eq_(doc['popularity'], 3)
+        eq_(doc['popularity_%s' % mkt.regions.BR.id], 3 + 2 * 10)
+        eq_(doc['popularity_%s' % mkt.regions.UK.id], 3)
+
+    def test_extract_documents(self):
+        other = app_factory()
+        AddonExcludedRegion.objects.create(addon=other, region=mkt.regions.BR.id)
+        qs = Webapp.indexing_transformer(
+            Webapp.uncached.filter(id__in=[self.app.pk, other.pk]))
+        objs = list(qs)
+        docs = WebappIndexer.extract_documents(objs)
+        eq_([d['id'] for d in docs], [o.id for o in objs])
+        for obj, doc in zip(objs, docs):
+            eq_(doc, WebappIndexer.extract_document(obj.pk, obj))
+
 
 class TestManifestUpload(BaseUploadTest, amo.tests.TestCase):
     fixtures = fixture('webapp_337141')
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import datetime
+import gzip
 import json
 import os
 import stat
@@ -10,6 +11,7 @@ from django.core.management import call_command
 from django.forms import ValidationError
 
 import mock
+import redisutils
 from nose.tools import eq_, ok_
 
 import amo
@@ -18,13 +20,15 @@ from addons.models import Addon
 from devhub.models import ActivityLog
 from editors.models import RereviewQueue
 from files.models import File, FileUpload
+from lib.es.utils import reindex_writes_key
 from users.models import UserProfile
 from versions.models import Version
 
 from mkt.site.fixtures import fixture
 from mkt.webapps.models import AppFeatures, Webapp
-from mkt.webapps.tasks import (dump_app, update_developer_name, update_features,
-                               update_manifests, zip_apps)
+from mkt.webapps import tasks
+from mkt.webapps.tasks import (dump_app, export_apps, update_developer_name,
+                               update_features, update_manifests, zip_apps)
 
 
 original = {
@@ -440,6 +444,37 @@ class TestDumpApps(amo.tests.TestCase):
             ok_(os.path.exists(os.path.join(settings.DUMPED_APPS_PATH, f)))
         ok_(os.stat(fn)[stat.ST_SIZE])
 
+    def read_export(self, fn):
+        return [json.loads(line) for line in gzip.open(fn)]
+
+    def test_export_apps(self):
+        fn = os.path.join(settings.DUMPED_APPS_PATH, 'exports', 'test.json.gz')
+        eq_(export_apps(fn), fn)
+        eq_([app['id'] for app in self.read_export(fn)], ['337141'])
+        ok_(not os.path.exists(fn + '.state'))
+
+    def test_export_apps_chunks(self):
+        fn = os.path.join(settings.DUMPED_APPS_PATH, 'exports', 'test.json.gz')
+        apps = [amo.tests.app_factory(status=amo.STATUS_PUBLIC)
+                for x in range(2)]
+        export_apps(fn, chunk_size=1)
+        # One gzip member per chunk, read back as one stream.
+        eq_([app['id'] for app in self.read_export(fn)],
+            ['337141'] + [str(app.id) for app in apps])
+
+    def test_export_apps_resume(self):
+        fn = os.path.join(settings.DUMPED_APPS_PATH, 'exports', 'test.json.gz')
+        export_apps(fn)
+        # Pretend the export stopped half way through the next chunk.
+        with open(fn + '.state', 'w') as f:
+            json.dump({'last_id': 337141, 'size': os.path.getsize(fn)}, f)
+        with open(fn, 'ab') as f:
+            f.write('\x1f\x8b\x08 not finished')
+        second = amo.tests.app_factory(status=amo.STATUS_PUBLIC)
+        export_apps(fn)
+        eq_([app['id'] for app in self.read_export(fn)],
+            ['337141', str(second.id)])
+
     @mock.patch('mkt.webapps.tasks.dump_app')
     def test_not_public(self, dump_app):
         app = Addon.objects.get(pk=337141)
@@ -667,3 +702,81 @@ class TestFixMissingIcons(amo.tests.TestCase):
         assert _log.any_call(337141, 'Webapp is missing icon size 64')
         assert _log.any_call(337141, 'Webapp is missing icon size 128')
         assert fetch_icon.called
+
+
+@mock.patch('mkt.webapps.tasks.index_webapps')
+class TestIndexQueue(amo.tests.RedisTest, amo.tests.TestCase):
+
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(settings, 'ES_INDEX_QUEUE_DELAY', 10),
+            # Celery is eager in tests, don't flush as soon as it's scheduled.
+            mock.patch.object(tasks.flush_index_queue, 'apply_async')]
+        self.schedule_flush = [p.start() for p in self.patches][1]
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_queue_coalesces(self, index_webapps):
+        tasks.queue_index_webapps([1])
+        tasks.queue_index_webapps([2])
+        tasks.queue_index_webapps([1])
+        assert not index_webapps.delay.called
+        # Only one flush is scheduled for all of them.
+        self.schedule_flush.assert_called_once_with(countdown=10)
+
+    def test_flush(self, index_webapps):
+        for id_ in (3, 1, 3, 2):
+            tasks.queue_index_webapps([id_])
+        index_webapps.reset_mock()
+        tasks.flush_index_queue()
+        index_webapps.delay.assert_called_once_with([1, 2, 3])
+
+        # Nothing is left to index.
+        index_webapps.reset_mock()
+        tasks.flush_index_queue()
+        assert not index_webapps.delay.called
+
+    def test_flush_keeps_ids_queued_meanwhile(self, index_webapps):
+        tasks.queue_index_webapps([1, 2])
+        redis = redisutils.connections['master']
+        smembers = redis.smembers
+
+        def read_then_queue(key):
+            members = set(smembers(key))
+            # Another app is queued right after the flush read the queue.
+            redis.sadd(key, 3)
+            return members
+
+        with mock.patch.object(redis, 'smembers', read_then_queue):
+            tasks.flush_index_queue()
+        index_webapps.delay.assert_called_once_with([1, 2])
+        eq_(set(int(id_) for id_ in redis.smembers(tasks.INDEX_QUEUE_KEY)),
+            set([3]))
+
+    def test_no_delay(self, index_webapps):
+        with self.settings(ES_INDEX_QUEUE_DELAY=0):
+            tasks.queue_index_webapps([1])
+        index_webapps.delay.assert_called_once_with([1])
+
+
+@mock.patch('mkt.webapps.tasks.WebappIndexer')
+class TestReindexWrites(amo.tests.RedisTest, amo.tests.TestCase):
+
+    def setUp(self):
+        self.redis = redisutils.connections['master']
+
+    @mock.patch('mkt.webapps.tasks.get_indices')
+    def test_recorded_during_reindex(self, get_indices, WebappIndexer):
+        WebappIndexer.extract_documents.return_value = []
+        get_indices.return_value = ['new', 'old']
+        tasks.index_webapps([1, 2], index='apps')
+        tasks.unindex_webapps([3], index='apps')
+        eq_(self.redis.smembers(reindex_writes_key('new')),
+            set(['1', '2', '3']))
+
+    def test_not_recorded(self, WebappIndexer):
+        WebappIndexer.extract_documents.return_value = []
+        tasks.index_webapps([1, 2], index='apps')
+        eq_(self.redis.smembers(reindex_writes_key('apps')), set())
@@ -11,7 +11,7 @@ from market.models import AddonPremium, AddonPurchase, Price
 from mkt.constants import APP_FEATURES, regions
 from mkt.site.fixtures import fixture
 from mkt.webapps.models import Installed, Webapp, WebappIndexer
-from mkt.webapps.utils import (app_to_dict, es_app_to_dict,
+from mkt.webapps.utils import (app_to_dict, es_app_related, es_app_to_dict,
                                get_supported_locales)
 from users.models import UserProfile
 
@@ -66,6 +66,16 @@ class TestAppToDict(amo.tests.TestCase):
         res = app_to_dict(self.app, profile=self.profile)
         self.check_profile(res['user'], developed=True)
 
+    def test_owned_other_app(self):
+        amo.tests.app_factory().addonuser_set.create(user=self.profile)
+        res = app_to_dict(self.app, profile=self.profile)
+        self.check_profile(res['user'])
+
+    def test_user_context_once(self):
+        app_to_dict(self.app, profile=self.profile)
+        with self.assertNumQueries(0):
+            app_to_dict(self.app, profile=self.profile)
+
     def test_locales(self):
         res = app_to_dict(self.app)
         eq_(res['default_locale'], 'en-US')
@@ -98,6 +108,18 @@ class TestAppToDict(amo.tests.TestCase):
         self.assertSetEqual(res['current_version']['required_features'],
                             [f.lower() for f in APP_FEATURES])
 
+    def test_cached(self):
+        app_to_dict(self.app)
+        with self.assertNumQueries(0):
+            eq_(app_to_dict(self.app)['slug'], self.app.app_slug)
+
+    def test_cached_invalidated(self):
+        eq_(app_to_dict(self.app)['previews'], [])
+        Preview.objects.create(addon=self.app, caption='foo')
+        eq_(len(app_to_dict(self.app)['previews']), 1)
+        self.app.update(app_slug='bar')
+        eq_(app_to_dict(self.app)['slug'], 'bar')
+
 
 class TestAppToDictPrices(amo.tests.TestCase):
     fixtures = fixture('prices')
@@ -218,6 +240,24 @@ class TestESAppToDict(amo.tests.ESTestCase):
         eq_(res['user'],
             {'developed': True, 'installed': True, 'purchased': True})
 
+    def test_user_not_developer(self):
+        res = es_app_to_dict(self.get_obj(), profile=self.profile)
+        eq_(res['user']['developed'], False)
+
+    def test_no_queries(self):
+        obj = self.get_obj()
+        related = es_app_related([obj])
+        with self.assertNumQueries(0):
+            es_app_to_dict(obj, related=related)
+
+    def test_price(self):
+        self.make_premium(self.app)
+        self.app.save()
+        self.refresh('webapp')
+        obj = self.get_obj()
+        res = es_app_to_dict(obj, related=es_app_related([obj]))
+        eq_(res['price'], self.app.addonpremium.price.get_price())
+
 
 class TestSupportedLocales(amo.tests.TestCase):
 
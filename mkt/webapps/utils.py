@@ -1,7 +1,9 @@
 from operator import attrgetter
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Max
 from django.utils import translation
 
 import commonware.log
@@ -10,9 +12,11 @@ import amo
 from access import acl
 from addons.models import AddonUser
 from amo.helpers import absolutify
-from amo.utils import find_language, no_translation
+from amo.utils import (cache_ns_key, epoch, find_language, memoize,
+                       no_translation)
 from constants.applications import DEVICE_TYPES
-from market.models import Price
+from files.models import File
+from market.models import price_table
 from users.models import UserProfile
 from versions.models import Version
 
@@ -52,8 +56,26 @@ def get_supported_locales(manifest):
         manifest.get('locales', {}).keys()))))
 
 
-def app_to_dict(app, region=None, profile=None):
-    """Return app data as dict for API."""
+def app_dict_key(app):
+    """
+    The cache key of the region and user independent part of app_to_dict,
+    which changes with the app, its current version and the language.
+    """
+    return 'webapps:app-dict:%s:%s:%s:%s' % (
+        cache_ns_key('webapps:app-dict:%s' % app.pk),
+        epoch(app.modified) if app.modified else 0,
+        app._current_version_id, translation.get_language())
+
+
+def invalidate_app_dict(app_id):
+    cache_ns_key('webapps:app-dict:%s' % app_id, increment=True)
+
+
+def _app_dict(app):
+    """
+    Returns the part of app_to_dict that is the same for every region and
+    user, and the price tier to look the price up in, if any.
+    """
     # Sad circular import issues.
     from mkt.api.resources import AppResource
     from mkt.developers.api import AccountResource
@@ -97,11 +119,11 @@ def app_to_dict(app, region=None, profile=None):
         'previews': PreviewResource().dehydrate_objects(app.previews.all()),
         'premium_type': amo.ADDON_PREMIUM_API[app.premium_type],
         'public_stats': app.public_stats,
-        'price': None,
-        'price_locale': None,
         'ratings': {'average': app.average_rating,
                     'count': app.total_reviews},
-        'regions': RegionResource().dehydrate_objects(app.get_regions()),
+        # Region names are lazy, translate them before they are cached.
+        'regions': [dict(r, name=unicode(r['name'])) for r in
+                    RegionResource().dehydrate_objects(app.get_regions())],
         'slug': app.app_slug,
         'supported_locales': (supported_locales.split(',') if supported_locales
                               else []),
@@ -119,25 +141,44 @@ def app_to_dict(app, region=None, profile=None):
             'resource_uri': AppResource().get_resource_uri(upsell),
         }
 
+    tier = None
     if app.premium:
         q = AddonPaymentAccount.objects.filter(addon=app)
         if len(q) > 0 and q[0].payment_account:
             data['payment_account'] = AccountResource().get_resource_uri(
                 q[0].payment_account)
-
-        data['price'] = app.get_price(region=region)
-        data['price_locale'] = app.get_price_locale(region=region)
+        if app.has_price():
+            tier = app.premium.price_id
 
     with no_translation():
         data['device_types'] = [n.api_name
                                 for n in app.device_types]
-    if profile:
-        data['user'] = {
-            'developed': AddonUser.objects.filter(
-                user=profile, role=amo.AUTHOR_ROLE_OWNER).exists(),
-            'installed': app.has_installed(profile),
-            'purchased': app.pk in profile.purchase_ids(),
-        }
+    return data, tier
+
+
+def app_to_dict(app, region=None, profile=None):
+    """
+    Return app data as dict for API. Everything but the price for `region`
+    and the `user` block is cached, see app_dict_key.
+    """
+    key = app_dict_key(app)
+    cached = cache.get(key)
+    if cached is None:
+        cached = _app_dict(app)
+        cache.set(key, cached, settings.WEBAPPS_APP_DICT_CACHE_TIMEOUT)
+    data, tier = cached
+    # Callers add to the dict, keep the cached one as it is.
+    data = dict(data)
+
+    data['price'] = data['price_locale'] = None
+    if tier:
+        data['price'] = price_table.get_price_data(tier, region=region)[0]
+        data['price_locale'] = price_table.get_price_locale(tier,
+                                                            region=region)
+
+    user = user_context(profile)
+    if user:
+        data['user'] = user.to_dict(app.pk)
 
     return data
 
@@ -162,16 +203,111 @@ def get_attr_lang(src, attr, default_locale):
     return value[0] if value else u''
 
 
-def es_app_to_dict(obj, region=None, profile=None):
+@memoize(prefix='webapps:developed-ids')
+def developed_ids(user_id):
+    return list(AddonUser.objects.filter(user=user_id,
+                                         role=amo.AUTHOR_ROLE_OWNER)
+                                 .values_list('addon', flat=True))
+
+
+@memoize(prefix='webapps:installed-ids')
+def installed_ids(user_id):
+    # Circular import.
+    from mkt.webapps.models import Installed
+    return list(Installed.objects.filter(user=user_id)
+                                 .values_list('addon', flat=True))
+
+
+class UserContext(object):
+    """
+    The ids of the apps a user owns, installed and purchased, for the `user`
+    block in the API. Get it with user_context, so each set is looked up at
+    most once per request, they are also kept in memcache.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    @amo.cached_property
+    def developed(self):
+        return set(developed_ids(self.profile.pk))
+
+    @amo.cached_property
+    def installed(self):
+        return set(installed_ids(self.profile.pk))
+
+    @amo.cached_property
+    def purchased(self):
+        return set(self.profile.purchase_ids())
+
+    def to_dict(self, app_id):
+        return {
+            'developed': app_id in self.developed,
+            'installed': app_id in self.installed,
+            'purchased': app_id in self.purchased,
+        }
+
+
+def user_context(profile):
+    """Returns the UserContext of `profile`, None if there is no user."""
+    if not profile or not isinstance(profile, UserProfile):
+        return None
+    # The profile is the request's amo_user, keep the context on it.
+    if not hasattr(profile, '_user_context'):
+        profile._user_context = UserContext(profile)
+    return profile._user_context
+
+
+def es_app_related(objs, reviewer=False):
+    """
+    Look up what update_with_reviewer_data needs from the database for a page
+    of elasticsearch results `objs`, with one query per table for the whole
+    page. Only reviewers need any queries at all.
+    """
+    # Circular import.
+    from editors.models import EscalationQueue
+
+    ids = [int(obj._id) for obj in objs]
+    related = {'versions': {}, 'statuses': {}, 'escalated': set()}
+
+    if ids and reviewer:
+        # Only fetch the latest version of each app, and its latest file.
+        # Clear the default ordering, it would be added to the GROUP BY.
+        latest = dict(Version.objects.filter(addon__in=ids).order_by()
+                             .values_list('addon').annotate(Max('created')))
+        versions = Version.objects.filter(addon__in=list(latest),
+                                          created__in=latest.values())
+        for version in versions.order_by('created'):
+            if version.created == latest[version.addon_id]:
+                related['versions'][version.addon_id] = version
+        files = File.objects.filter(
+            version__in=[v.id for v in related['versions'].values()])
+        statuses = dict(files.order_by('created')
+                             .values_list('version', 'status'))
+        for addon_id, version in related['versions'].items():
+            related['statuses'][addon_id] = statuses.get(version.id)
+        related['escalated'] = set(
+            EscalationQueue.objects.filter(addon__in=ids)
+                                   .values_list('addon', flat=True))
+    return related
+
+
+def es_app_to_dict(obj, region=None, profile=None, related=None):
     """
     Return app data as dict for API where `app` is the elasticsearch result.
+
+    Pass `related` from es_app_related to serialize a page of results without
+    querying the database for each of them.
     """
     # Circular import.
     from mkt.api.base import GenericObject
     from mkt.api.resources import AppResource, PrivacyPolicyResource
     from mkt.developers.api import AccountResource
     from mkt.developers.models import AddonPaymentAccount
-    from mkt.webapps.models import Installed, Webapp
+    from mkt.webapps.models import Webapp
+
+    if related is None:
+        related = es_app_related([obj])
 
     src = obj._source
     # The following doesn't perform a database query, but gives us useful
@@ -212,22 +348,28 @@ def es_app_to_dict(obj, region=None, profile=None):
             app.get_region_ids(worldwide=True,
                                excluded=obj.region_exclusions)))
 
+    data['payment_account'] = None
     if src['premium_type'] in amo.ADDON_PREMIUMS:
-        acct = list(AddonPaymentAccount.objects.filter(addon=app))
-        if acct and acct.payment_account:
+        if 'payment_account' in src:
+            account_id = src['payment_account']
+        else:
+            # Documents indexed before the payment account was added.
+            account_id = (AddonPaymentAccount.objects.filter(addon=obj._id)
+                          .values_list('payment_account', flat=True)[:1]
+                          or [None])[0]
+        if account_id:
             data['payment_account'] = AccountResource().get_resource_uri(
-                acct.payment_account)
-    else:
-        data['payment_account'] = None
+                GenericObject({'pk': account_id}))
 
     data['price'] = data['price_locale'] = None
-    try:
-        if src['price_tier']:
-            price = Price.objects.get(name=src['price_tier'])
-            data['price'] = price.get_price(region=region)
-            data['price_locale'] = price.get_price_locale(region=region)
-    except Price.DoesNotExist:
-        log.warning('Issue with price tier on app: {0}'.format(obj._id))
+    if src['price_tier']:
+        tier = price_table.get_tier(src['price_tier'])
+        if tier:
+            data['price'] = price_table.get_price_data(tier, region=region)[0]
+            data['price_locale'] = price_table.get_price_locale(
+                tier, region=region)
+        else:
+            log.warning('Issue with price tier on app: {0}'.format(obj._id))
 
     data['upsell'] = False
     if hasattr(obj, 'upsell'):
@@ -235,36 +377,36 @@ def es_app_to_dict(obj, region=None, profile=None):
         data['upsell']['resource_uri'] = AppResource().get_resource_uri(
             Webapp(id=obj.upsell['id']))
 
-    # TODO: Let's get rid of these from the API to avoid db hits.
-    if profile and isinstance(profile, UserProfile):
-        data['user'] = {
-            'developed': AddonUser.objects.filter(
-                user=profile, role=amo.AUTHOR_ROLE_OWNER).exists(),
-            'installed': Installed.objects.filter(
-                user=profile, addon_id=obj.id).exists(),
-            'purchased': obj.id in profile.purchase_ids(),
-        }
+    user = user_context(profile)
+    if user:
+        data['user'] = user.to_dict(int(obj._id))
 
     return data
 
 
-def update_with_reviewer_data(bundle):
-    """Adds reviewer specific data to app response bundle."""
+def update_with_reviewer_data(bundle, related=None):
+    """
+    Adds reviewer specific data to app response bundle.
+
+    Pass `related` from es_app_related, looked up with `reviewer=True`, to do
+    this for a page of elasticsearch results without querying for each.
+    """
     # TODO: Reviewer flags in ES (bug 848446)
     from editors.models import EscalationQueue
 
     if acl.action_allowed(bundle.request, 'Apps', 'Review'):
         # Try to get bundle.obj._id first if it's coming from elasticsearch.
         # Fallback to database results using `.id`.
-        addon_id = getattr(bundle.obj, '_id', bundle.obj.id)
-        version = Version.objects.filter(addon_id=addon_id).latest()
-        escalated = EscalationQueue.objects.filter(
-            addon_id=addon_id).exists()
-
-        if hasattr(bundle.data, 'latest_version_status'):
+        addon_id = int(getattr(bundle.obj, '_id', bundle.obj.id))
+        if related is not None:
+            version = related['versions'].get(addon_id)
+            escalated = addon_id in related['escalated']
             bundle.data['latest_version_status'] = (
-                bundle.obj.latest_version_status)
+                related['statuses'].get(addon_id))
         else:
+            version = Version.objects.filter(addon_id=addon_id).latest()
+            escalated = EscalationQueue.objects.filter(
+                addon_id=addon_id).exists()
             try:
                 file_ = version and version.files.latest()
                 bundle.data['latest_version_status'] = (
@@ -273,8 +415,8 @@ def update_with_reviewer_data(bundle):
                 bundle.data['latest_version_status'] = None
 
         bundle.data['reviewer_flags'] = {
-            'has_comment': version.has_editor_comment,
-            'has_info_request': version.has_info_request,
+            'has_comment': version.has_editor_comment if version else False,
+            'has_info_request': version.has_info_request if version else False,
             'is_escalated': escalated,
         }
 
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Replays a corpus of plugin finder query strings against services/pfs.py
+and reports how long a request takes, uncached and cached.
+
+Usage::
+
+    python scripts/bench_pfs.py [-n 1000] [scripts/corpora/pfs.txt]
+
+The corpus has one query string per line, as found in the access logs.
+"""
+import optparse
+import os
+import site
+import sys
+import time
+from urlparse import parse_qsl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ['', 'lib', 'apps', 'vendor/lib/python']:
+    site.addsitedir(os.path.join(ROOT, path))
+
+from services import pfs
+
+
+def run(queries, number, func):
+    start = time.time()
+    for x in xrange(number):
+        for query in queries:
+            func(query)
+    return (time.time() - start) / (number * len(queries))
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog [options] [corpus]')
+    p.add_option('-n', '--number', type='int', default=1000,
+                 help='Number of times to replay the corpus.')
+    options, args = p.parse_args()
+    corpus = (args[0] if args else
+              os.path.join(ROOT, 'scripts', 'corpora', 'pfs.txt'))
+    with open(corpus) as f:
+        queries = [dict(parse_qsl(line.strip())) for line in f if line.strip()]
+
+    print 'Replaying %s queries %s times.' % (len(queries), options.number)
+    uncached = run(queries, options.number, pfs.render_output)
+    pfs.output_cache.clear()
+    cached = run(queries, options.number, pfs.get_output)
+    print 'uncached: %.1f us/request' % (uncached * 1e6)
+    print 'cached:   %.1f us/request' % (cached * 1e6)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
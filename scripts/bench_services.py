@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+Replays recorded request corpora against the services/ WSGI applications
+in-process and reports throughput, p50/p99 latency and queries per request.
+
+Usage::
+
+    python scripts/bench_services.py [-n 10] [-f FIXTURE] [service ...]
+
+The services are update, verify, theme_update and pfs. Each one replays
+scripts/corpora/<service>.txt unless a corpus is given with ``--corpus``,
+which then applies to every service named. A corpus has one request per
+line: the request path, or just a query string for the service's usual path,
+optionally followed by a space and a body, which makes it a POST.
+
+The services query SERVICES_DATABASE directly with MySQL, so it has to be
+seeded with the data the corpora refer to. ``--fixture`` loads Django
+fixtures into it first, by pointing Django's default database at it, the
+corpora shipped here refer to base/addon_3615 and addons/persona. Do not
+point this at a database you care about.
+
+update is run twice, first with SERVICES_UPDATE_CACHE off so its numbers
+are for rendering every response, then as update:cached with the RDF cache
+on, which is how it runs by default.
+"""
+import optparse
+import os
+import site
+import sys
+import time
+from StringIO import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ['', 'lib', 'apps', 'services', 'vendor/lib/python']:
+    site.addsitedir(os.path.join(ROOT, path))
+
+# The services are imported from the services package below, so their
+# `from utils import ...` finds services.utils. That is a different module,
+# with a different pool, from the top level utils the versioncheck WSGI file
+# ends up with, so use the one the services here actually share.
+from services import utils
+
+# The module of each service and the path its query string lines go to.
+SERVICES = {
+    'update': ('services.update', '/update/VersionCheck.php'),
+    'verify': ('services.verify', '/verify/'),
+    'theme_update': ('services.theme_update', '/themes/update-check/'),
+    'pfs': ('services.pfs', '/pfs.php'),
+}
+
+
+class CountingCursor(object):
+    """Counts the queries sent through a cursor."""
+
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args, **kw):
+        self._counter[0] += 1
+        return self._cursor.execute(*args, **kw)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection(object):
+
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self, *args, **kw):
+        return CountingCursor(self._conn.cursor(*args, **kw), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def count_queries(modules):
+    """
+    Swaps the shared pool for one whose connections count queries. Returns
+    a one item list holding the count so far.
+    """
+    counter = [0]
+    pool = utils.TimedQueuePool(
+        lambda: CountingConnection(utils.getconn(), counter),
+        **getattr(utils.settings, 'SERVICES_DATABASE_POOL', {}))
+    for module in modules:
+        if hasattr(module, 'mypool'):
+            module.mypool = pool
+    return counter
+
+
+def read_corpus(filename, default_path):
+    requests = []
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            target, _, body = line.partition(' ')
+            if not target.startswith('/'):
+                target = '%s?%s' % (default_path, target)
+            path, _, query = target.partition('?')
+            requests.append((path, query, body))
+    return requests
+
+
+def environ(path, query, body):
+    return {
+        'REQUEST_METHOD': 'POST' if body else 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_USER_AGENT': 'bench_services',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': StringIO(body),
+    }
+
+
+def percentile(timings, pct):
+    return timings[min(len(timings) - 1, int(len(timings) * pct / 100.0))]
+
+
+def bench(application, requests, number, counter):
+    """Returns the sorted request timings and the queries run."""
+    start_response = lambda status, headers: None
+    timings = []
+    counter[0] = 0
+    for x in xrange(number):
+        for request in requests:
+            start = time.time()
+            ''.join(application(environ(*request), start_response))
+            timings.append(time.time() - start)
+    return sorted(timings), counter[0]
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog [options] [service ...]')
+    p.add_option('-n', '--number', type='int', default=10,
+                 help='Number of times to replay each corpus.')
+    p.add_option('-c', '--corpus',
+                 help='Corpus to replay instead of the recorded one.')
+    p.add_option('-f', '--fixture', action='append', default=[],
+                 help='Django fixture to load before running, repeatable.')
+    options, args = p.parse_args()
+    names = args or sorted(SERVICES)
+    for name in names:
+        if name not in SERVICES:
+            p.error('Unknown service %r, choose from: %s'
+                    % (name, ', '.join(sorted(SERVICES))))
+
+    if options.fixture:
+        from django.conf import settings
+        from django.core.management import call_command
+        # loaddata writes to the default database, which the services never
+        # read, so point it at theirs. Nothing has connected yet.
+        db = utils.settings.SERVICES_DATABASE
+        settings.DATABASES['default'].update(
+            (key, db[key]) for key in ('NAME', 'USER', 'PASSWORD', 'HOST'))
+        call_command('loaddata', *options.fixture, verbosity=0)
+
+    modules = dict((name, __import__(SERVICES[name][0], fromlist=['x']))
+                   for name in names)
+    counter = count_queries(modules.values())
+
+    print '%-14s %8s %10s %10s %10s %10s' % (
+        'service', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'queries')
+    for name in names:
+        corpus = options.corpus or os.path.join(ROOT, 'scripts', 'corpora',
+                                                '%s.txt' % name)
+        requests = read_corpus(corpus, SERVICES[name][1])
+        runs = [(name, None)]
+        if name == 'update':
+            runs = [(name, False), ('update:cached', True)]
+        for label, cached in runs:
+            module = modules[name]
+            if cached is not None:
+                module.settings.SERVICES_UPDATE_CACHE = cached
+                module.local_cache.clear()
+            timings, queries = bench(module.application, requests,
+                                     options.number, counter)
+            print '%-14s %8s %10.1f %10.2f %10.2f %10.2f' % (
+                label, len(timings), len(timings) / sum(timings),
+                percentile(timings, 50) * 1000,
+                percentile(timings, 99) * 1000,
+                float(queries) / len(timings))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
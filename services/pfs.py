@@ -11,6 +11,7 @@ from django.core.management import setup_environ
 import commonware.log
 import jinja2
 
+from lib.misc.lru import LRUCache
 from utils import log_configure
 
 import settings_local as settings
@@ -64,10 +65,240 @@ java_re = re.compile(r'^application/x-java-((applet|bean)(;jpi-version=1\.5|;ver
 wmp_re = re.compile(r'^(application/(asx|x-(mplayer2|ms-wmp))|video/x-ms-(asf(-plugin)?|wm(p|v|x)?|wvx)|audio/x-ms-w(ax|ma))$')
 
 
+def os_re(pattern):
+    """Returns a test for `clientOS`, matched from the start."""
+    regex = re.compile(pattern)
+    return lambda g: regex.match(g['clientOS'])
+
+
+def os_startswith(prefix):
+    return lambda g: g['clientOS'].startswith(prefix)
+
+
+def always(g):
+    return True
+
+
+class Plugin(object):
+    """
+    A plugin we know where to get, for a set of mimetypes (or mimetypes
+    matching a regex) on the operating systems matched by `test`.
+
+    `variants` is a list of (test, fields) pairs, the fields of the first
+    variant whose test passes are added to `fields`.
+    """
+
+    def __init__(self, mimetypes, test, fields, variants=()):
+        if isinstance(mimetypes, basestring):
+            mimetypes = [mimetypes]
+        self.mimetypes = mimetypes
+        self.test = test
+        self.fields = fields
+        self.variants = variants
+
+    def handles(self, mimetype):
+        if hasattr(self.mimetypes, 'match'):
+            return bool(self.mimetypes.match(mimetype))
+        return mimetype in self.mimetypes
+
+    def get_fields(self, g):
+        fields = dict(self.fields)
+        for test, variant in self.variants:
+            if test(g):
+                fields.update(variant)
+                break
+        return fields
+
+
+# The order matters, the first plugin that handles the mimetype and
+# passes the test for the client OS is the one offered.
+PLUGINS = [
+    Plugin(['application/x-shockwave-flash', 'application/futuresplash'],
+           lambda g: flash_re.match(g['clientOS']),
+           dict(name='Adobe Flash Player',
+                manualInstallationURL='http://www.adobe.com/go/getflashplayer'),
+           # Offer Windows users a specific flash plugin installer instead.
+           # Don't use a https URL for the license here, per request from
+           # Macromedia.
+           [(os_startswith('Win'), dict(
+               guid='{4cfaef8a-a6c9-41a0-8e6f-967eb8f49143}',
+               XPILocation='',
+               iconUrl='http://fpdownload2.macromedia.com/pub/flashplayer/current/fp_win_installer.ico',
+               needsRestart='false',
+               InstallerShowsUI='true',
+               version='11.7.700.224',
+               InstallerHash='sha256:973e4a4c41ae5c94cdc8ed21064fbe55c285ba79100396126716f0d845c8633e',
+               InstallerLocation='http://download.macromedia.com/pub/flashplayer/pdc/fp_pl_pfs_installer.exe'))]),
+
+    Plugin('application/x-director', os_startswith('Win'),
+           dict(name='Adobe Shockwave Player',
+                manualInstallationURL='http://get.adobe.com/shockwave/',
+                guid='{45f2a22c-4029-4209-8b3d-1421b989633f}',
+                XPILocation='',
+                version='12.0.2.122',
+                InstallerHash='sha256:70d9dce4ad508276afe39992eb7a30c9475e3d778324ebfa831e2a1732a83738',
+                InstallerLocation='http://fpdownload.macromedia.com/pub/shockwave/default/english/win95nt/latest/Shockwave_Installer_FF.exe',
+                needsRestart='false',
+                InstallerShowsUI='false'),
+           # Even though the shockwave installer is not a silent installer,
+           # we need to show its EULA here since we've got a slimmed down
+           # installer that doesn't do that itself.
+           [(lambda g: g['chromeLocale'] != 'ja-JP', dict(
+               licenseURL='http://www.adobe.com/go/eula_shockwaveplayer')),
+            (always, dict(
+               licenseURL='http://www.adobe.com/go/eula_shockwaveplayer_jp'))]),
+
+    Plugin(['audio/x-pn-realaudio-plugin', 'audio/x-pn-realaudio'],
+           os_re(r'^(Win|Linux|PPC Mac OS X)'),
+           dict(name='Real Player',
+                version='10.5',
+                manualInstallationURL='http://www.real.com'),
+           [(os_startswith('Win'), dict(
+               XPILocation='http://forms.real.com/real/player/download.html?type=firefox',
+               guid='{d586351c-cb55-41a7-8e7b-4aaac5172d39}')),
+            (always, dict(
+               guid='{269eb771-59de-4702-9209-ca97ce522f6d}'))]),
+
+    # Well, we don't have a plugin that can handle any of those mimetypes,
+    # but the Apple Quicktime plugin can. Point the user to the Quicktime
+    # download page.
+    Plugin(quicktime_re, os_re(r'^(Win|PPC Mac OS X)'),
+           dict(name='Apple Quicktime',
+                guid='{a42bb825-7eee-420f-8ee7-834062b6fefd}',
+                InstallerShowsUI='true',
+                manualInstallationURL='http://www.apple.com/quicktime/download/')),
+
+    # We don't want to link users directly to the Java plugin because we
+    # want to warn them about ongoing security problems first. Link to SUMO.
+    Plugin(java_re, os_re(r'^(Win|Linux|PPC Mac OS X)'),
+           dict(name='Java Runtime Environment',
+                manualInstallationURL='https://support.mozilla.org/kb/use-java-plugin-to-view-interactive-content',
+                needsRestart='false',
+                guid='{fbe640ef-4375-4f45-8d79-767d60bf75b8}')),
+
+    Plugin(['application/pdf', 'application/vnd.fdf',
+            'application/vnd.adobe.xfdf', 'application/vnd.adobe.xdp+xml',
+            'application/vnd.adobe.xfd+xml'],
+           os_re(r'^(Win|PPC Mac OS X|Linux(?! x86_64))'),
+           dict(name='Adobe Acrobat Plug-In',
+                guid='{d87cd824-67cb-4547-8587-616c70318095}',
+                manualInstallationURL='http://www.adobe.com/products/acrobat/readstep.html')),
+
+    Plugin('application/x-mtx', os_re(r'^(Win|PPC Mac OS X)'),
+           dict(name='Viewpoint Media Player',
+                guid='{03f998b2-0e00-11d3-a498-00104b6eb52e}',
+                manualInstallationURL='http://www.viewpoint.com/pub/products/vmp.html')),
+
+    # For all windows users who don't have the WMP 11 plugin, give them a
+    # link for it. For OSX users -- added Intel to this since flip4mac is a
+    # UB. Contact at MS was okay w/ this, plus MS points to this anyway.
+    Plugin(wmp_re, always, {},
+           [(os_startswith('Win'), dict(
+               name='Windows Media Player',
+               version='11',
+               guid='{cff1240a-fd24-4b9f-8183-ccd96e5300d0}',
+               manualInstallationURL='http://port25.technet.com/pages/windows-media-player-firefox-plugin-download.aspx')),
+            (os_re(r'^(PPC|Intel) Mac OS X'), dict(
+               name='Flip4Mac',
+               version='2.1',
+               guid='{cff0240a-fd24-4b9f-8183-ccd96e5300d0}',
+               manualInstallationURL='http://www.flip4mac.com/wmv_download.htm'))]),
+
+    Plugin('application/x-xstandard', os_re(r'^(Win|PPC Mac OS X)'),
+           dict(name='XStandard XHTML WYSIWYG Editor',
+                guid='{3563d917-2f44-4e05-8769-47e655e92361}',
+                iconUrl='http://xstandard.com/images/xicon32x32.gif',
+                XPILocation='http://xstandard.com/download/xstandard.xpi',
+                InstallerShowsUI='false',
+                manualInstallationURL='http://xstandard.com/download/',
+                licenseURL='http://xstandard.com/license/')),
+
+    Plugin('application/x-dnl', os_startswith('Win'),
+           dict(name='DNL Reader',
+                guid='{ce9317a3-e2f8-49b9-9b3b-a7fb5ec55161}',
+                version='5.5',
+                iconUrl='http://digitalwebbooks.com/reader/dwb16.gif',
+                XPILocation='http://digitalwebbooks.com/reader/xpinst.xpi',
+                InstallerShowsUI='false',
+                manualInstallationURL='http://digitalwebbooks.com/reader/')),
+
+    Plugin('application/x-videoegg-loader', os_startswith('Win'),
+           dict(name='VideoEgg Publisher',
+                guid='{b8b881f0-2e07-11db-a98b-0800200c9a66}',
+                iconUrl='http://videoegg.com/favicon.ico',
+                XPILocation='http://update.videoegg.com/Install/Windows/Initial/VideoEggPublisher.xpi',
+                InstallerShowsUI='true',
+                manualInstallationURL='http://www.videoegg.com/')),
+
+    Plugin('video/divx', os_startswith('Win'),
+           dict(name='DivX Web Player',
+                guid='{a8b771f0-2e07-11db-a98b-0800200c9a66}',
+                iconUrl='http://images.divx.com/divx/player/webplayer.png',
+                XPILocation='http://download.divx.com/player/DivXWebPlayer.xpi',
+                InstallerShowsUI='false',
+                licenseURL='http://go.divx.com/plugin/license/',
+                manualInstallationURL='http://go.divx.com/plugin/download/')),
+
+    Plugin('video/divx', os_re(r'^(PPC|Intel) Mac OS X'),
+           dict(name='DivX Web Player',
+                guid='{a8b771f0-2e07-11db-a98b-0800200c9a66}',
+                iconUrl='http://images.divx.com/divx/player/webplayer.png',
+                XPILocation='http://download.divx.com/player/DivXWebPlayerMac.xpi',
+                InstallerShowsUI='false',
+                licenseURL='http://go.divx.com/plugin/license/',
+                manualInstallationURL='http://go.divx.com/plugin/download/')),
+]
+
+
+def compile_plugins(plugins):
+    """
+    Builds a {mimetype: [plugin, ...]} table for the plugins that list their
+    mimetypes, and a list of the plugins that match mimetypes with a regex.
+    Each list keeps the order of `plugins`.
+    """
+    by_mimetype, by_regex = defaultdict(list), []
+    for plugin in plugins:
+        if hasattr(plugin.mimetypes, 'match'):
+            by_regex.append(plugin)
+        else:
+            for mimetype in plugin.mimetypes:
+                by_mimetype[mimetype].append(plugin)
+    return dict(by_mimetype), by_regex
+
+
+plugins_by_mimetype, plugins_by_regex = compile_plugins(PLUGINS)
+# Mimetype -> candidate plugins, so the regexes are only run once for each
+# mimetype seen.
+candidates_cache = LRUCache(size=1000)
+# Rendered output, keyed on everything the output depends on.
+output_cache = LRUCache(size=getattr(settings, 'PFS_CACHE_SIZE', 10000))
+
+required = ['mimetype', 'appID', 'appVersion', 'clientOS', 'chromeLocale']
+
+
+def get_candidates(mimetype):
+    candidates = candidates_cache.get(mimetype)
+    if candidates is None:
+        candidates = plugins_by_mimetype.get(mimetype)
+        if candidates is None:
+            # None of the listed mimetypes overlap with the regexes.
+            candidates = [p for p in plugins_by_regex if p.handles(mimetype)]
+        candidates_cache.set(mimetype, candidates)
+    return candidates
+
+
 def get_output(data):
-    g = defaultdict(str, [(k, jinja2.escape(v)) for k, v in data.iteritems()])
+    key = (data.get('mimetype'), data.get('clientOS'),
+           data.get('chromeLocale'), all(s in data for s in required))
+    output = output_cache.get(key)
+    if output is None:
+        output = render_output(data)
+        output_cache.set(key, output)
+    return output
 
-    required = ['mimetype', 'appID', 'appVersion', 'clientOS', 'chromeLocale']
+
+def render_output(data):
+    g = defaultdict(str, [(k, jinja2.escape(v)) for k, v in data.iteritems()])
 
     # Some defaults we override depending on what we find below.
     plugin = dict(mimetype='-1', name='-1', guid='-1', version='',
@@ -88,240 +319,11 @@ def get_output(data):
 
     # Figure out what plugins we've got, and what plugins we know where
     # to get.
+    for candidate in get_candidates(g['mimetype']):
+        if candidate.test(g):
+            plugin.update(candidate.get_fields(g))
+            break
 
-    # Begin our huge and embarrassing if-else statement.
-    if (g['mimetype'] in ['application/x-shockwave-flash',
-                          'application/futuresplash'] and
-        re.match(flash_re, g['clientOS'])):
-
-        # Tell the user where they can go to get the installer.
-
-        plugin.update(
-            name='Adobe Flash Player',
-            manualInstallationURL='http://www.adobe.com/go/getflashplayer')
-
-        # Offer Windows users a specific flash plugin installer instead.
-        # Don't use a https URL for the license here, per request from
-        # Macromedia.
-
-        if g['clientOS'].startswith('Win'):
-            plugin.update(
-                guid='{4cfaef8a-a6c9-41a0-8e6f-967eb8f49143}',
-                XPILocation='',
-                iconUrl='http://fpdownload2.macromedia.com/pub/flashplayer/current/fp_win_installer.ico',
-                needsRestart='false',
-                InstallerShowsUI='true',
-                version='11.7.700.224',
-                InstallerHash='sha256:973e4a4c41ae5c94cdc8ed21064fbe55c285ba79100396126716f0d845c8633e',
-                InstallerLocation='http://download.macromedia.com/pub/flashplayer/pdc/fp_pl_pfs_installer.exe')
-
-    elif (g['mimetype'] == 'application/x-director' and
-          g['clientOS'].startswith('Win')):
-        plugin.update(
-            name='Adobe Shockwave Player',
-            manualInstallationURL='http://get.adobe.com/shockwave/')
-
-        # Even though the shockwave installer is not a silent installer, we
-        # need to show its EULA here since we've got a slimmed down
-        # installer that doesn't do that itself.
-        if g['chromeLocale'] != 'ja-JP':
-            plugin.update(
-                licenseURL='http://www.adobe.com/go/eula_shockwaveplayer')
-        else:
-            plugin.update(
-                licenseURL='http://www.adobe.com/go/eula_shockwaveplayer_jp')
-        plugin.update(
-            guid='{45f2a22c-4029-4209-8b3d-1421b989633f}',
-            XPILocation='',
-            version='12.0.2.122',
-            InstallerHash='sha256:70d9dce4ad508276afe39992eb7a30c9475e3d778324ebfa831e2a1732a83738',
-            InstallerLocation='http://fpdownload.macromedia.com/pub/shockwave/default/english/win95nt/latest/Shockwave_Installer_FF.exe',
-            needsRestart='false',
-            InstallerShowsUI='false')
-
-    elif (g['mimetype'] in ['audio/x-pn-realaudio-plugin',
-                            'audio/x-pn-realaudio'] and
-          re.match(r'^(Win|Linux|PPC Mac OS X)', g['clientOS'])):
-        plugin.update(
-            name='Real Player',
-            version='10.5',
-            manualInstallationURL='http://www.real.com')
-
-        if g['clientOS'].startswith('Win'):
-            plugin.update(
-                XPILocation='http://forms.real.com/real/player/download.html?type=firefox',
-                guid='{d586351c-cb55-41a7-8e7b-4aaac5172d39}')
-        else:
-            plugin.update(
-                guid='{269eb771-59de-4702-9209-ca97ce522f6d}')
-
-    elif (re.match(quicktime_re, g['mimetype']) and
-          re.match(r'^(Win|PPC Mac OS X)', g['clientOS'])):
-
-        # Well, we don't have a plugin that can handle any of those
-        # mimetypes, but the Apple Quicktime plugin can. Point the user to
-        # the Quicktime download page.
-
-        plugin.update(
-            name='Apple Quicktime',
-            guid='{a42bb825-7eee-420f-8ee7-834062b6fefd}',
-            InstallerShowsUI='true',
-            manualInstallationURL='http://www.apple.com/quicktime/download/')
-
-    elif (re.match(java_re, g['mimetype']) and
-          re.match(r'^(Win|Linux|PPC Mac OS X)', g['clientOS'])):
-
-        # We serve up the Java plugin for the following mimetypes:
-        #
-        # application/x-java-vm
-        # application/x-java-applet;jpi-version=1.5
-        # application/x-java-bean;jpi-version=1.5
-        # application/x-java-applet;version=1.3
-        # application/x-java-bean;version=1.3
-        # application/x-java-applet;version=1.2.2
-        # application/x-java-bean;version=1.2.2
-        # application/x-java-applet;version=1.2.1
-        # application/x-java-bean;version=1.2.1
-        # application/x-java-applet;version=1.4.2
-        # application/x-java-bean;version=1.4.2
-        # application/x-java-applet;version=1.5
-        # application/x-java-bean;version=1.5
-        # application/x-java-applet;version=1.3.1
-        # application/x-java-bean;version=1.3.1
-        # application/x-java-applet;version=1.4
-        # application/x-java-bean;version=1.4
-        # application/x-java-applet;version=1.4.1
-        # application/x-java-bean;version=1.4.1
-        # application/x-java-applet;version=1.2
-        # application/x-java-bean;version=1.2
-        # application/x-java-applet;version=1.1.3
-        # application/x-java-bean;version=1.1.3
-        # application/x-java-applet;version=1.1.2
-        # application/x-java-bean;version=1.1.2
-        # application/x-java-applet;version=1.1.1
-        # application/x-java-bean;version=1.1.1
-        # application/x-java-applet;version=1.1
-        # application/x-java-bean;version=1.1
-        # application/x-java-applet
-        # application/x-java-bean
-        #
-        #
-        # We don't want to link users directly to the Java plugin because
-        # we want to warn them about ongoing security problems first. Link
-        # to SUMO.
-
-        plugin.update(
-            name='Java Runtime Environment',
-            manualInstallationURL='https://support.mozilla.org/kb/use-java-plugin-to-view-interactive-content',
-            needsRestart='false',
-            guid='{fbe640ef-4375-4f45-8d79-767d60bf75b8}')
-
-    elif (g['mimetype'] in ['application/pdf', 'application/vnd.fdf',
-                            'application/vnd.adobe.xfdf',
-                            'application/vnd.adobe.xdp+xml',
-                            'application/vnd.adobe.xfd+xml'] and
-          re.match(r'^(Win|PPC Mac OS X|Linux(?! x86_64))', g['clientOS'])):
-        plugin.update(
-            name='Adobe Acrobat Plug-In',
-            guid='{d87cd824-67cb-4547-8587-616c70318095}',
-            manualInstallationURL='http://www.adobe.com/products/acrobat/readstep.html')
-
-    elif (g['mimetype'] == 'application/x-mtx' and
-          re.match(r'^(Win|PPC Mac OS X)', g['clientOS'])):
-        plugin.update(
-            name='Viewpoint Media Player',
-            guid='{03f998b2-0e00-11d3-a498-00104b6eb52e}',
-            manualInstallationURL='http://www.viewpoint.com/pub/products/vmp.html')
-
-    elif re.match(wmp_re, g['mimetype']):
-        # We serve up the Windows Media Player plugin for the following
-        # mimetypes:
-        #
-        # application/asx
-        # application/x-mplayer2
-        # audio/x-ms-wax
-        # audio/x-ms-wma
-        # video/x-ms-asf
-        # video/x-ms-asf-plugin
-        # video/x-ms-wm
-        # video/x-ms-wmp
-        # video/x-ms-wmv
-        # video/x-ms-wmx
-        # video/x-ms-wvx
-        #
-        # For all windows users who don't have the WMP 11 plugin, give them
-        # a link for it.
-        if g['clientOS'].startswith('Win'):
-            plugin.update(
-                name='Windows Media Player',
-                version='11',
-                guid='{cff1240a-fd24-4b9f-8183-ccd96e5300d0}',
-                manualInstallationURL='http://port25.technet.com/pages/windows-media-player-firefox-plugin-download.aspx')
-
-        # For OSX users -- added Intel to this since flip4mac is a UB.
-        # Contact at MS was okay w/ this, plus MS points to this anyway.
-        elif re.match(r'^(PPC|Intel) Mac OS X', g['clientOS']):
-            plugin.update(
-                name='Flip4Mac',
-                version='2.1',
-                guid='{cff0240a-fd24-4b9f-8183-ccd96e5300d0}',
-                manualInstallationURL='http://www.flip4mac.com/wmv_download.htm')
-
-    elif (g['mimetype'] == 'application/x-xstandard' and
-          re.match(r'^(Win|PPC Mac OS X)', g['clientOS'])):
-        plugin.update(
-            name='XStandard XHTML WYSIWYG Editor',
-            guid='{3563d917-2f44-4e05-8769-47e655e92361}',
-            iconUrl='http://xstandard.com/images/xicon32x32.gif',
-            XPILocation='http://xstandard.com/download/xstandard.xpi',
-            InstallerShowsUI='false',
-            manualInstallationURL='http://xstandard.com/download/',
-            licenseURL='http://xstandard.com/license/')
-
-    elif (g['mimetype'] == 'application/x-dnl' and
-          g['clientOS'].startswith('Win')):
-        plugin.update(
-            name='DNL Reader',
-            guid='{ce9317a3-e2f8-49b9-9b3b-a7fb5ec55161}',
-            version='5.5',
-            iconUrl='http://digitalwebbooks.com/reader/dwb16.gif',
-            XPILocation='http://digitalwebbooks.com/reader/xpinst.xpi',
-            InstallerShowsUI='false',
-            manualInstallationURL='http://digitalwebbooks.com/reader/')
-
-    elif (g['mimetype'] == 'application/x-videoegg-loader' and
-          g['clientOS'].startswith('Win')):
-        plugin.update(
-            name='VideoEgg Publisher',
-            guid='{b8b881f0-2e07-11db-a98b-0800200c9a66}',
-            iconUrl='http://videoegg.com/favicon.ico',
-            XPILocation='http://update.videoegg.com/Install/Windows/Initial/VideoEggPublisher.xpi',
-            InstallerShowsUI='true',
-            manualInstallationURL='http://www.videoegg.com/')
-
-    elif (g['mimetype'] == 'video/divx' and
-          g['clientOS'].startswith('Win')):
-        plugin.update(
-            name='DivX Web Player',
-            guid='{a8b771f0-2e07-11db-a98b-0800200c9a66}',
-            iconUrl='http://images.divx.com/divx/player/webplayer.png',
-            XPILocation='http://download.divx.com/player/DivXWebPlayer.xpi',
-            InstallerShowsUI='false',
-            licenseURL='http://go.divx.com/plugin/license/',
-            manualInstallationURL='http://go.divx.com/plugin/download/')
-
-    elif (g['mimetype'] == 'video/divx' and
-          re.match(r'^(PPC|Intel) Mac OS X', g['clientOS'])):
-        plugin.update(
-            name='DivX Web Player',
-            guid='{a8b771f0-2e07-11db-a98b-0800200c9a66}',
-            iconUrl='http://images.divx.com/divx/player/webplayer.png',
-            XPILocation='http://download.divx.com/player/DivXWebPlayerMac.xpi',
-            InstallerShowsUI='false',
-            licenseURL='http://go.divx.com/plugin/license/',
-            manualInstallationURL='http://go.divx.com/plugin/download/')
-
-    # End ridiculously huge and embarrassing if-else block.
     return output.substitute(plugin)
 
 
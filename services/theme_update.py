@@ -1,4 +1,5 @@
 import base64
+import hashlib
 import json
 import os
 import posixpath
@@ -9,6 +10,7 @@ from wsgiref.handlers import format_date_time
 from django.core.management import setup_environ
 
 from constants import base
+from lib.misc.lru import LRUCache
 from utils import log_configure, log_exception, mypool
 
 from services.utils import settings
@@ -18,9 +20,14 @@ setup_environ(settings)
 log_configure()
 
 # This has to be imported after the settings (utils).
+from django.core.cache import cache
 from django_statsd.clients import statsd
 
 
+# Base64 encoded icons, keyed on the icon path and its mtime.
+icon_cache = LRUCache(size=1000)
+
+
 class ThemeUpdate(object):
 
     def __init__(self, locale, id_, qs=None):
@@ -40,11 +47,16 @@ class ThemeUpdate(object):
             self.cursor = self.conn.cursor()
 
     def base64_icon(self, addon_id):
-        path = self.image_path('icon.jpg')
+        path = self.icon_path()
         try:
-            with open(path, 'r') as f:
-                return base64.b64encode(f.read())
-        except IOError, e:
+            key = (path, os.stat(path).st_mtime)
+            icon = icon_cache.get(key)
+            if icon is None:
+                with open(path, 'r') as f:
+                    icon = base64.b64encode(f.read())
+                icon_cache.set(key, icon)
+            return icon
+        except (IOError, OSError), e:
             if len(e.args) == 1:
                 log_exception('I/O error: {0}'.format(e[0]))
             else:
@@ -78,6 +90,8 @@ class ThemeUpdate(object):
         SELECT p.persona_id, a.id, a.slug,
             t_name.localized_string AS name,
             t_desc.localized_string AS description,
+            t_name_default.localized_string AS default_name,
+            t_desc_default.localized_string AS default_description,
             p.display_username, p.header,
             p.footer, p.accentcolor, p.textcolor,
             UNIX_TIMESTAMP(a.modified) AS modified
@@ -87,6 +101,10 @@ class ThemeUpdate(object):
             ON t_name.id=a.name AND t_name.locale=%(locale)s
         LEFT JOIN translations AS t_desc
             ON t_desc.id=a.summary AND t_desc.locale=%(locale)s
+        LEFT JOIN translations AS t_name_default
+            ON t_name_default.id=a.name AND t_name_default.locale='en-US'
+        LEFT JOIN translations AS t_desc_default
+            ON t_desc_default.id=a.summary AND t_desc_default.locale='en-US'
         WHERE p.{primary_key}=%(id)s AND
             a.addontype_id=%(atype)s AND a.status=4 AND a.inactive=0
         """.format(primary_key=self.data['primary_key'])
@@ -94,30 +112,85 @@ class ThemeUpdate(object):
         self.cursor.execute(sql, self.data)
         row = self.cursor.fetchone()
 
-        row_to_dict = lambda row: dict(zip((
-            'persona_id', 'addon_id', 'slug', 'name', 'description',
-            'username', 'header', 'footer', 'accentcolor', 'textcolor',
-            'modified'),
-            list(row)))
-
         if row:
-            self.data['row'] = row_to_dict(row)
+            row = dict(zip((
+                'persona_id', 'addon_id', 'slug', 'name', 'description',
+                'default_name', 'default_description', 'username', 'header',
+                'footer', 'accentcolor', 'textcolor', 'modified'),
+                list(row)))
 
             # Fall back to `en-US` if the name was null for our locale.
-            # TODO: Write smarter SQL and don't rerun the whole query.
-            if not self.data['row']['name']:
+            if not row['name']:
                 self.data['locale'] = 'en-US'
-                self.cursor.execute(sql, self.data)
-                row = self.cursor.fetchone()
-                if row:
-                    self.data['row'] = row_to_dict(row)
+                row['name'] = row['default_name']
+                row['description'] = row['default_description']
 
+            self.data['row'] = row
             return True
 
         return False
 
-    # TODO: Cache on row['modified']
+    def get_modified(self):
+        """
+        Returns the `modified` timestamp of the theme, or None if there is no
+        such theme. Along with `icon_mtime` this is all that is needed to find
+        a cached response.
+        """
+        sql = """
+        SELECT UNIX_TIMESTAMP(a.modified), p.persona_id, a.id
+        FROM addons AS a
+        INNER JOIN personas AS p ON p.addon_id=a.id
+        WHERE p.{primary_key}=%(id)s AND
+            a.addontype_id=%(atype)s AND a.status=4 AND a.inactive=0
+        """.format(primary_key=self.data['primary_key'])
+
+        self.cursor.execute(sql, self.data)
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        # Enough of the row for `icon_path`.
+        self.data['row'] = {'persona_id': row[1], 'addon_id': row[2]}
+        return row[0]
+
+    def icon_path(self):
+        return self.image_path('icon.jpg')
+
+    def icon_mtime(self):
+        """
+        Returns the mtime of the icon embedded in the response, or None if
+        there isn't one. Icons can be replaced without the theme's `modified`
+        changing.
+        """
+        try:
+            return os.stat(self.icon_path()).st_mtime
+        except OSError:
+            return None
+
+    def get_cache_key(self, modified, icon_mtime):
+        return 'theme-update:%s' % hashlib.md5('%s:%s:%s:%s:%s' % (
+            self.data['id'], self.data['locale'], self.from_gp,
+            modified, icon_mtime)).hexdigest()
+
     def get_json(self):
+        modified = self.get_modified()
+        if modified is None:
+            # Persona not found.
+            return
+
+        # The key includes the `modified` timestamp and the icon's mtime, so
+        # any change to the theme or its icon means a new key.
+        key = self.get_cache_key(modified, self.icon_mtime())
+        output = cache.get(key)
+        if output is None:
+            statsd.incr('services.theme_update.cache.miss')
+            output = self.build_json()
+            if output:
+                cache.set(key, output,
+                          getattr(settings, 'THEME_UPDATE_CACHE_TIMEOUT',
+                                  60 * 60 * 24))
+        return output
+
+    def build_json(self):
         if not self.get_update():
             # Persona not found.
             return
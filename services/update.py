@@ -1,5 +1,7 @@
+import hashlib
 import smtplib
 import sys
+import threading
 import traceback
 
 from email.Utils import formatdate
@@ -14,11 +16,10 @@ import settings_local as settings
 setup_environ(settings)
 # This has to be imported after the settings so statsd knows where to log to.
 from django_statsd.clients import statsd
+from django.core.cache import cache
 
 
 import commonware.log
-import MySQLdb as mysql
-import sqlalchemy.pool as pool
 
 
 try:
@@ -27,7 +28,9 @@ except ImportError:
     from apps.versions.compare import version_int
 
 from constants import applications, base
-from utils import (APP_GUIDS, get_mirror, log_configure, PLATFORMS,
+from lib.misc.lru import LRUCache
+from update_index import UpdateIndex
+from utils import (APP_GUIDS, get_mirror, log_configure, mypool, PLATFORMS,
                    STATUSES_PUBLIC)
 
 # Go configure the log.
@@ -82,19 +85,112 @@ timing_log = commonware.log.getLogger('z.timer')
 error_log = commonware.log.getLogger('z.services')
 
 
-def getconn():
-    db = settings.SERVICES_DATABASE
-    return mysql.connect(host=db['HOST'], user=db['USER'],
-                         passwd=db['PASSWORD'], db=db['NAME'])
-
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the worker's `UpdateIndex` if SERVICES_UPDATE_INDEX is on and it
+    has been loaded. It is loaded in the background from the first call on
+    and refreshed when stale, until then this returns None and requests are
+    answered with SQL.
+    """
+    global _index
+    if not getattr(settings, 'SERVICES_UPDATE_INDEX', False):
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = UpdateIndex(
+                    mypool.connect,
+                    refresh=getattr(settings,
+                                    'SERVICES_UPDATE_INDEX_REFRESH', 60),
+                    rebuild=getattr(settings,
+                                    'SERVICES_UPDATE_INDEX_REBUILD', 600))
+    _index.maybe_refresh()
+    return _index if _index.loaded else None
+
+
+# Rendered RDF is kept in memcache for SERVICES_UPDATE_CACHE_TIMEOUT and
+# in front of that in a small per worker LRU. Entries in the LRU don't
+# check the memcache namespace, so they can be up to
+# SERVICES_UPDATE_CACHE_LOCAL_TIMEOUT seconds stale after an invalidation.
+local_cache = LRUCache(
+    size=getattr(settings, 'SERVICES_UPDATE_CACHE_LOCAL_SIZE', 1000),
+    timeout=getattr(settings, 'SERVICES_UPDATE_CACHE_LOCAL_TIMEOUT', 30))
+
+
+def get_cache_ns_key(guid):
+    """
+    Returns the memcache key of the namespace for the RDF of `guid`. This
+    matches `amo.utils.cache_ns_key('update-rdf:<md5 of guid>')`, which
+    zamboni increments through `Addon.invalidate_update_rdf` when a file or
+    version changes. The guid comes from the query string, so hash it to
+    get a safe key.
+    """
+    if isinstance(guid, unicode):
+        guid = guid.encode('utf-8')
+    return 'ns:update-rdf:%s' % hashlib.md5(guid).hexdigest()
+
+
+def get_cache_key(data, compat_mode):
+    """
+    Returns the part of the cache key that identifies the request. Only the
+    parameters the response depends on are used, with appOS normalized the
+    same way `Update.is_valid` does it.
+    """
+    app_os = ''
+    for k, v in PLATFORMS.items():
+        if k in data.get('appOS', ''):
+            app_os = v
+            break
+    parts = [data.get(k, '') for k in
+             ('id', 'version', 'reqVersion', 'appID', 'appVersion')]
+    parts.extend([app_os, compat_mode])
+    return hashlib.md5('|'.join(map(str, parts))).hexdigest()
+
+
+def get_cached_rdf(update):
+    """Returns the RDF for `update`, rendering it on a cache miss."""
+    if not getattr(settings, 'SERVICES_UPDATE_CACHE', False):
+        return update.get_rdf()
+
+    key = get_cache_key(update.data, update.compat_mode)
+    rdf = local_cache.get(key)
+    if rdf is not None:
+        statsd.incr('services.update.cache.local')
+        return rdf
 
-mypool = pool.QueuePool(getconn, max_overflow=10, pool_size=5, recycle=300)
+    timeout = getattr(settings, 'SERVICES_UPDATE_CACHE_TIMEOUT', 3600)
+    ns_key = get_cache_ns_key(update.data.get('id', ''))
+    ns = cache.get(ns_key)
+    rdf = None
+    if ns is not None:
+        rdf = cache.get('update-rdf:%s:%s' % (ns, key))
+    if rdf is not None:
+        statsd.incr('services.update.cache.hit')
+    else:
+        statsd.incr('services.update.cache.miss')
+        rdf = update.get_rdf()
+        # `is_valid` only sets the guid for add-ons that exist, anything
+        # else is not worth a namespace or a cache entry.
+        if not update.data.get('guid'):
+            return rdf
+        if ns is None:
+            ns = int(time())
+            cache.set(ns_key, ns, timeout)
+        cache.set('update-rdf:%s:%s' % (ns, key), rdf, timeout)
+    local_cache.set(key, rdf)
+    return rdf
 
 
 class Update(object):
 
-    def __init__(self, data, compat_mode='strict'):
+    def __init__(self, data, compat_mode='strict', index=None):
         self.conn, self.cursor = None, None
+        # When an `UpdateIndex` is given, no SQL is run at all.
+        self.index = index
         self.data = data.copy()
         self.data['row'] = {}
         self.flags = {'use_version': False, 'multiple_status': False}
@@ -105,7 +201,7 @@ class Update(object):
     def is_valid(self):
         # If you accessing this from unit tests, then before calling
         # is valid, you can assign your own cursor.
-        if not self.cursor:
+        if not self.cursor and not self.index:
             self.conn = mypool.connect()
             self.cursor = self.conn.cursor()
 
@@ -120,14 +216,17 @@ class Update(object):
         if not data['app_id']:
             return False
 
-        sql = """SELECT id, status, addontype_id, guid FROM addons
-                 WHERE guid = %(guid)s AND
-                       inactive = 0 AND
-                       status != %(STATUS_DELETED)s
-                 LIMIT 1;"""
-        self.cursor.execute(sql, {'guid': self.data['id'],
-                                  'STATUS_DELETED': base.STATUS_DELETED})
-        result = self.cursor.fetchone()
+        if self.index:
+            result = self.index.get_addon(self.data['id'])
+        else:
+            sql = """SELECT id, status, addontype_id, guid FROM addons
+                     WHERE guid = %(guid)s AND
+                           inactive = 0 AND
+                           status != %(STATUS_DELETED)s
+                     LIMIT 1;"""
+            self.cursor.execute(sql, {'guid': self.data['id'],
+                                      'STATUS_DELETED': base.STATUS_DELETED})
+            result = self.cursor.fetchone()
         if result is None:
             return False
 
@@ -153,14 +252,18 @@ class Update(object):
             # Beta channel looks at the addon name to see if it's beta.
             if self.is_beta_version:
                 # For beta look at the status of the existing files.
-                sql = """
-                    SELECT versions.id, status
-                    FROM files INNER JOIN versions
-                    ON files.version_id = versions.id
-                    WHERE versions.addon_id = %(id)s
-                          AND versions.version = %(version)s LIMIT 1;"""
-                self.cursor.execute(sql, data)
-                result = self.cursor.fetchone()
+                if self.index:
+                    result = self.index.get_beta_status(data['id'],
+                                                        data['version'])
+                else:
+                    sql = """
+                        SELECT versions.id, status
+                        FROM files INNER JOIN versions
+                        ON files.version_id = versions.id
+                        WHERE versions.addon_id = %(id)s
+                              AND versions.version = %(version)s LIMIT 1;"""
+                    self.cursor.execute(sql, data)
+                    result = self.cursor.fetchone()
                 # Only change the status if there are files.
                 if result is not None:
                     status = result[1]
@@ -184,6 +287,29 @@ class Update(object):
         self.get_beta()
         data = self.data
 
+        if self.index:
+            result = self.index.get_update(data, self.flags, self.compat_mode)
+        else:
+            result = self.get_update_sql()
+
+        if result:
+            row = dict(zip([
+                'guid', 'type', 'disabled_by_user', 'appguid', 'min', 'max',
+                'file_id', 'file_status', 'hash', 'filename', 'version_id',
+                'datestatuschanged', 'strict_compat', 'releasenotes',
+                'version', 'premium_type'],
+                list(result)))
+            row['type'] = base.ADDON_SLUGS_UPDATE[row['type']]
+            row['url'] = get_mirror(self.data['addon_status'],
+                                    self.data['id'], row)
+            data['row'] = row
+            return True
+
+        return False
+
+    def get_update_sql(self):
+        data = self.data
+
         sql = ["""
             SELECT
                 addons.guid as guid, addons.addontype_id as type,
@@ -264,22 +390,7 @@ class Update(object):
         sql.append('ORDER BY versions.id DESC LIMIT 1;')
 
         self.cursor.execute(''.join(sql), data)
-        result = self.cursor.fetchone()
-
-        if result:
-            row = dict(zip([
-                'guid', 'type', 'disabled_by_user', 'appguid', 'min', 'max',
-                'file_id', 'file_status', 'hash', 'filename', 'version_id',
-                'datestatuschanged', 'strict_compat', 'releasenotes',
-                'version', 'premium_type'],
-                list(result)))
-            row['type'] = base.ADDON_SLUGS_UPDATE[row['type']]
-            row['url'] = get_mirror(self.data['addon_status'],
-                                    self.data['id'], row)
-            data['row'] = row
-            return True
-
-        return False
+        return self.cursor.fetchone()
 
     def get_bad_rdf(self):
         return bad_rdf
@@ -292,7 +403,8 @@ class Update(object):
                 rdf = self.get_no_updates_rdf()
         else:
             rdf = self.get_bad_rdf()
-        self.cursor.close()
+        if self.cursor:
+            self.cursor.close()
         if self.conn:
             self.conn.close()
         return rdf
@@ -355,8 +467,8 @@ def application(environ, start_response):
         data = dict(parse_qsl(environ['QUERY_STRING']))
         compat_mode = data.pop('compatMode', 'strict')
         try:
-            update = Update(data, compat_mode)
-            output = update.get_rdf()
+            update = Update(data, compat_mode, index=get_index())
+            output = get_cached_rdf(update)
             start_response(status, update.get_headers(len(output)))
         except:
             #mail_exception(data)
@@ -0,0 +1,316 @@
+"""
+An in-process index of everything `update.Update` needs to answer an
+update ping, so that a worker can serve `get_rdf` without going to MySQL.
+
+The index is built with a handful of bulk queries and then refreshed
+incrementally: every refresh asks the database which add-ons had their
+addon, version or file rows modified since the last refresh and reloads
+just those add-ons. `applications_versions` has no `modified` column, so
+a full rebuild is done every `SERVICES_UPDATE_INDEX_REBUILD` seconds to
+pick up compatibility range changes. Rows that are deleted outright don't
+show up as modified either, so a deleted version or file stays in the index
+until the next rebuild unless something else about its add-on changed.
+
+Refreshes build new tables and swap them in with a single assignment, so
+the threads answering requests never see a half loaded add-on. They run in
+a background thread, one at a time, while requests keep using the current
+tables. Until the first load is done `loaded` is False and requests should
+be answered without the index.
+"""
+import logging
+import threading
+from time import time
+
+try:
+    from compare import version_int
+except ImportError:
+    from apps.versions.compare import version_int
+
+from constants import applications, base
+
+
+ADDON_COLUMNS = ('id', 'status', 'type', 'guid', 'premium_type')
+FILE_COLUMNS = ('id', 'version_id', 'platform_id', 'status', 'hash',
+                'filename', 'datestatuschanged', 'strict_compat',
+                'binary_components')
+
+log = logging.getLogger('z.services')
+
+
+def _le(a, b):
+    # MySQL comparisons against NULL are never true, Python 2 ones are.
+    return a is not None and b is not None and a <= b
+
+
+class IndexedVersion(object):
+
+    def __init__(self, id, version, releasenotes):
+        self.id = id
+        self.version = version
+        self.releasenotes = releasenotes
+        # Application id -> (min, max, min_int, max_int).
+        self.apps = {}
+        self.files = []
+
+
+class UpdateIndex(object):
+
+    def __init__(self, connect, refresh=60, rebuild=3600):
+        self.connect = connect
+        self.refresh_interval = refresh
+        self.rebuild_interval = rebuild
+        # (guid -> addon dict, addon id -> guid,
+        #  addon id -> [IndexedVersion] newest first), swapped as a whole.
+        self.tables = ({}, {}, {})
+        self.incompatible = {}  # version id -> [(app_id, min, max, ...)].
+        self.since = None
+        self.refreshed = 0
+        self.rebuilt = 0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.since is not None
+
+    def maybe_refresh(self):
+        """
+        Start refreshing the index in a background thread if it has gone
+        stale, called per request. Nothing happens if another thread is
+        already refreshing it.
+        """
+        now = time()
+        full = now - self.rebuilt > self.rebuild_interval
+        if not full and now - self.refreshed <= self.refresh_interval:
+            return
+        if not self._lock.acquire(False):
+            return
+        thread = threading.Thread(target=self._background_refresh,
+                                  args=(full,))
+        thread.daemon = True
+        try:
+            thread.start()
+        except Exception:
+            self._lock.release()
+            raise
+
+    def _background_refresh(self, full):
+        try:
+            self.refresh(full=full)
+        except Exception:
+            log.exception('Update index refresh failed')
+        finally:
+            self._lock.release()
+
+    def refresh(self, cursor=None, full=False):
+        """
+        Bring the index up to date. If `cursor` is given it is used instead
+        of checking out a connection, which is what the tests do.
+        """
+        conn = None
+        if cursor is None:
+            conn = self.connect()
+            cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT NOW();')
+            started = cursor.fetchone()[0]
+            if full or self.since is None:
+                self.load(cursor)
+                self.rebuilt = time()
+            else:
+                self.load(cursor, self.changed_addons(cursor))
+            self.load_incompatible(cursor)
+            self.since = started
+            self.refreshed = time()
+        finally:
+            if conn:
+                cursor.close()
+                conn.close()
+
+    def changed_addons(self, cursor):
+        cursor.execute("""
+            SELECT id FROM addons WHERE modified >= %(since)s
+            UNION
+            SELECT addon_id FROM versions WHERE modified >= %(since)s
+            UNION
+            SELECT versions.addon_id FROM files
+            INNER JOIN versions ON files.version_id = versions.id
+            WHERE files.modified >= %(since)s;""", {'since': self.since})
+        return [r[0] for r in cursor.fetchall()]
+
+    def load(self, cursor, ids=None):
+        """
+        Load the add-ons in `ids`, or every add-on if `ids` is None, dropping
+        anything previously indexed for them.
+        """
+        if ids is None:
+            addons, guids, versions = {}, {}, {}
+            where = ''
+        else:
+            if not ids:
+                return
+            # Work on copies, the current tables are in use by requests.
+            addons, guids, versions = [t.copy() for t in self.tables]
+            for id_ in ids:
+                addons.pop(guids.pop(id_, None), None)
+                versions.pop(id_, None)
+            where = ' AND addons.id IN (%s)' % ','.join(
+                str(int(id_)) for id_ in ids)
+
+        cursor.execute("""
+            SELECT id, status, addontype_id, guid, premium_type FROM addons
+            WHERE inactive = 0 AND status != %(STATUS_DELETED)s
+                  AND guid IS NOT NULL""" + where + ';',
+            {'STATUS_DELETED': base.STATUS_DELETED})
+        for row in cursor.fetchall():
+            addon = dict(zip(ADDON_COLUMNS, row))
+            addons[addon['guid']] = addon
+            guids[addon['id']] = addon['guid']
+            versions[addon['id']] = []
+
+        by_id = {}
+        cursor.execute("""
+            SELECT versions.id, versions.addon_id, versions.version,
+                   versions.releasenotes
+            FROM versions INNER JOIN addons ON addons.id = versions.addon_id
+            WHERE addons.inactive = 0""" + where +
+            ' ORDER BY versions.id DESC;')
+        for id_, addon_id, version, notes in cursor.fetchall():
+            if addon_id in versions:
+                by_id[id_] = IndexedVersion(id_, version, notes)
+                versions[addon_id].append(by_id[id_])
+
+        cursor.execute("""
+            SELECT applications_versions.version_id,
+                   applications_versions.application_id,
+                   appmin.version, appmax.version,
+                   appmin.version_int, appmax.version_int
+            FROM applications_versions
+            INNER JOIN versions
+                ON versions.id = applications_versions.version_id
+            INNER JOIN addons ON addons.id = versions.addon_id
+            INNER JOIN appversions appmin
+                ON appmin.id = applications_versions.min
+            INNER JOIN appversions appmax
+                ON appmax.id = applications_versions.max
+            WHERE addons.inactive = 0""" + where + ';')
+        for row in cursor.fetchall():
+            if row[0] in by_id:
+                by_id[row[0]].apps[row[1]] = row[2:]
+
+        cursor.execute("""
+            SELECT files.id, files.version_id, files.platform_id,
+                   files.status, files.hash, files.filename,
+                   files.datestatuschanged, files.strict_compatibility,
+                   files.binary_components
+            FROM files
+            INNER JOIN versions ON versions.id = files.version_id
+            INNER JOIN addons ON addons.id = versions.addon_id
+            WHERE addons.inactive = 0""" + where + ' ORDER BY files.id;')
+        for row in cursor.fetchall():
+            if row[1] in by_id:
+                by_id[row[1]].files.append(dict(zip(FILE_COLUMNS, row)))
+
+        self.tables = (addons, guids, versions)
+
+    def load_incompatible(self, cursor):
+        # This is a small denormalized table, reloading it is cheap.
+        cursor.execute("""
+            SELECT version_id, app_id, min_app_version, max_app_version,
+                   min_app_version_int, max_app_version_int
+            FROM incompatible_versions;""")
+        incompatible = {}
+        for row in cursor.fetchall():
+            incompatible.setdefault(row[0], []).append(row[1:])
+        self.incompatible = incompatible
+
+    def get_addon(self, guid):
+        """Same result as the guid lookup in `Update.is_valid`."""
+        addon = self.tables[0].get(guid)
+        if addon is None:
+            return None
+        return addon['id'], addon['status'], addon['type'], addon['guid']
+
+    def get_beta_status(self, addon_id, version):
+        """Same result as the file status lookup in `Update.get_beta`."""
+        for v in reversed(self.tables[2].get(addon_id, [])):
+            if v.version == version and v.files:
+                return v.id, v.files[0]['status']
+        return None
+
+    def is_incompatible(self, version_id, app_id, vint):
+        # Mirrors the `incompatible_versions` subquery in `get_update`,
+        # including the precedence of its AND/OR clauses.
+        for app, min_, max_, min_int, max_int in (
+                self.incompatible.get(version_id, [])):
+            if ((app == app_id and min_ == '0' and _le(vint, max_int)) or
+                (_le(min_int, vint) and max_ == '*') or
+                (_le(min_int, vint) and _le(vint, max_int))):
+                return True
+        return False
+
+    def get_update(self, data, flags, compat_mode):
+        """
+        Returns the row `Update.get_update` would have fetched from the
+        database, or None.
+        """
+        addons, guids, versions = self.tables
+        addon = addons.get(guids.get(data['id']))
+        if addon is None:
+            return None
+
+        app_id = data['app_id']
+        vint = int(data['version_int'])
+        platforms = (1, data.get('appOS') or 1)
+        if flags['multiple_status']:
+            statuses = (base.STATUS_PUBLIC, base.STATUS_LITE,
+                        base.STATUS_LITE_AND_NOMINATED)
+        else:
+            statuses = (data['status'],)
+        d2c_max = None
+        if compat_mode == 'normal':
+            d2c_max = applications.D2C_MAX_VERSIONS.get(app_id)
+            if d2c_max:
+                d2c_max = version_int(d2c_max)
+
+        for version in versions.get(addon['id'], []):
+            if app_id not in version.apps:
+                continue
+            if (flags['use_version'] and
+                version.version != data['version']):
+                continue
+
+            min_, max_, min_int, max_int = version.apps[app_id]
+            if not _le(min_int, vint):
+                continue
+
+            for file_ in version.files:
+                if file_['platform_id'] not in platforms:
+                    continue
+                if flags['use_version']:
+                    if not file_['status'] > data['status']:
+                        continue
+                elif file_['status'] not in statuses:
+                    continue
+
+                if compat_mode == 'ignore':
+                    pass
+                elif compat_mode == 'normal':
+                    if ((file_['strict_compat'] or
+                         file_['binary_components']) and
+                        not _le(vint, max_int)):
+                        continue
+                    if d2c_max and not _le(d2c_max, max_int):
+                        continue
+                    if self.is_incompatible(version.id, app_id, vint):
+                        continue
+                elif not _le(vint, max_int):
+                    continue
+
+                return (addon['guid'], addon['type'], 0,
+                        applications.APPS_ALL[app_id].guid, min_, max_,
+                        file_['id'], file_['status'], file_['hash'],
+                        file_['filename'], version.id,
+                        file_['datestatuschanged'], file_['strict_compat'],
+                        version.releasenotes, version.version,
+                        addon['premium_type'])
+        return None
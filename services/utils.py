@@ -15,9 +15,10 @@ if settingmodule.startswith(('zamboni',  # typical git clone destination
 import posixpath
 import re
 import sys
+from time import time
 
 from cef import log_cef as _log_cef
-import MySQLdb as mysql
+from sqlalchemy import event
 import sqlalchemy.pool as pool
 
 from django.core.management import setup_environ
@@ -29,6 +30,8 @@ settings = importlib.import_module(settingmodule)
 # Pyflakes will complain about these, but they are required for setup.
 setup_environ(settings)
 from lib.log_settings_base import formatters, handlers, loggers
+# This has to be imported after the settings so statsd knows where to log to.
+from django_statsd.clients import statsd
 
 # Ugh. But this avoids any zamboni or django imports at all.
 # Perhaps we can import these without any problems and we can
@@ -91,13 +94,54 @@ def get_mirror(status, id, row):
     return posixpath.join(host, str(id), row['filename'])
 
 
+def get_driver():
+    """
+    Returns the DB-API module to connect with. PyMySQL is pure Python, so
+    under gevent or eventlet monkey patching its I/O is cooperative and a
+    worker can have many queries in flight.
+    """
+    if getattr(settings, 'SERVICES_DATABASE_DRIVER', 'MySQLdb') == 'pymysql':
+        import pymysql
+        return pymysql
+    import MySQLdb
+    return MySQLdb
+
+
 def getconn():
     db = settings.SERVICES_DATABASE
-    return mysql.connect(host=db['HOST'], user=db['USER'],
-                         passwd=db['PASSWORD'], db=db['NAME'])
+    return get_driver().connect(host=db['HOST'], user=db['USER'],
+                                passwd=db['PASSWORD'], db=db['NAME'])
+
+
+class TimedQueuePool(pool.QueuePool):
+    """A QueuePool that sends how long a checkout waited to statsd."""
+
+    def connect(self):
+        with statsd.timer('services.db.pool.wait'):
+            return super(TimedQueuePool, self).connect()
+
+
+def on_checkout(dbapi_con, con_record, con_proxy):
+    con_record.info['checkout_time'] = time()
+    statsd.incr('services.db.pool.checkout')
+    if mypool.overflow() > 0:
+        statsd.incr('services.db.pool.overflow')
+
+
+def on_checkin(dbapi_con, con_record):
+    start = con_record.info.pop('checkout_time', None)
+    if start is not None:
+        statsd.timing('services.db.pool.checked_out',
+                      int((time() - start) * 1000))
 
 
-mypool = pool.QueuePool(getconn, max_overflow=10, pool_size=5, recycle=300)
+# This is the one pool shared by all the services, configure it with
+# SERVICES_DATABASE_POOL.
+mypool = TimedQueuePool(getconn, **getattr(
+    settings, 'SERVICES_DATABASE_POOL',
+    {'max_overflow': 10, 'pool_size': 5, 'recycle': 300}))
+event.listen(mypool, 'checkout', on_checkout)
+event.listen(mypool, 'checkin', on_checkin)
 
 
 def log_configure():
@@ -1,5 +1,7 @@
 import calendar
+import copy
 from datetime import datetime
+import hashlib
 import json
 from time import gmtime, time
 from urlparse import parse_qsl, urlparse
@@ -21,19 +23,46 @@ from browserid.errors import ExpiredSignatureError
 import jwt
 from lib.crypto.receipt import sign
 from lib.cef_loggers import receipt_cef
+from lib.misc.lru import LRUCache
+from mkt.receipts.cache import install_key, purchase_key
 
 # This has to be imported after the settings (utils).
 import receipts  # used for patching in the tests
 from receipts import certs
+from django.core.cache import cache
 from django_statsd.clients import statsd
 
 status_codes = {
     200: '200 OK',
+    400: '400 Bad Request',
     405: '405 Method Not Allowed',
     500: '500 Internal Server Error',
 }
 
 
+# Install and purchase lookups are cached in memcache, where they are
+# cleared when the Installed or AddonPurchase changes, and in front of
+# that for a few seconds in each process.
+lookup_cache = LRUCache(size=settings.WEBAPPS_RECEIPT_LOOKUP_LOCAL_SIZE,
+                        timeout=settings.WEBAPPS_RECEIPT_LOOKUP_LOCAL_TIMEOUT)
+
+
+def cached_lookup(key, lookup):
+    """
+    Returns the cached result for `key`, calling `lookup` on a miss. Missing
+    rows are cached too, as an empty tuple.
+    """
+    result = lookup_cache.get(key)
+    if result is None:
+        result = cache.get(key)
+        if result is None:
+            statsd.incr('services.verify.lookup.miss')
+            result = tuple(lookup() or ())
+            cache.set(key, result, settings.WEBAPPS_RECEIPT_LOOKUP_TIMEOUT)
+        lookup_cache.set(key, result)
+    return result
+
+
 class VerificationError(Exception):
     pass
 
@@ -58,6 +87,9 @@ class Verify:
         self.premium = None
         # This is so the unit tests can override the connection.
         self.conn, self.cursor = None, None
+        # When verifying in a batch these are filled in by `BatchVerify`
+        # and used instead of querying the database for each receipt.
+        self.installs, self.purchases = None, None
 
     def setup_db(self):
         if not self.cursor:
@@ -130,6 +162,10 @@ class Verify:
         If its invalid, then just return invalid rather than give out any
         information.
         """
+        if self.decoded is not None:
+            # Already decoded, for example by `BatchVerify`.
+            return self.decoded
+
         try:
             receipt = decode_receipt(self.receipt)
         except:
@@ -182,8 +218,20 @@ class Verify:
         if not self.decoded:
             raise ValueError('decode not run')
 
-        self.setup_db()
-        # Get the addon and user information from the installed table.
+        uuid, self.addon_id = self.get_install_key()
+        result = self.get_install(uuid)
+        if not result:
+            # We've got no record of this receipt being created.
+            log_info('No entry in users_install for uuid: %s' % uuid)
+            raise InvalidReceipt
+
+        pk, self.user_id, self.premium = result
+
+    def get_install_key(self):
+        """
+        Returns the uuid and addon id of the decoded receipt, which are used
+        to look it up in `users_install`.
+        """
         try:
             uuid = self.decoded['user']['value']
         except KeyError:
@@ -194,35 +242,50 @@ class Verify:
 
         try:
             storedata = self.decoded['product']['storedata']
-            self.addon_id = int(dict(parse_qsl(storedata)).get('id', ''))
+            addon_id = int(dict(parse_qsl(storedata)).get('id', ''))
         except:
             # There was some value for storedata but it was invalid.
             log_info('Invalid store data')
             raise InvalidReceipt
 
-        sql = """SELECT id, user_id, premium_type FROM users_install
-                 WHERE addon_id = %(addon_id)s
-                 AND uuid = %(uuid)s LIMIT 1;"""
-        self.cursor.execute(sql, {'addon_id': self.addon_id,
-                                  'uuid': uuid})
-        result = self.cursor.fetchone()
-        if not result:
-            # We've got no record of this receipt being created.
-            log_info('No entry in users_install for uuid: %s' % uuid)
-            raise InvalidReceipt
+        return uuid, addon_id
 
-        pk, self.user_id, self.premium = result
+    def get_install(self, uuid):
+        if self.installs is not None:
+            return self.installs.get((self.addon_id, uuid))
+
+        def lookup():
+            self.setup_db()
+            sql = """SELECT id, user_id, premium_type FROM users_install
+                     WHERE addon_id = %(addon_id)s
+                     AND uuid = %(uuid)s LIMIT 1;"""
+            self.cursor.execute(sql, {'addon_id': self.addon_id,
+                                      'uuid': uuid})
+            return self.cursor.fetchone()
+
+        return cached_lookup(install_key(self.addon_id, uuid), lookup)
+
+    def get_purchase(self):
+        if self.purchases is not None:
+            return self.purchases.get((self.addon_id, self.user_id))
+
+        def lookup():
+            self.setup_db()
+            sql = """SELECT id, type FROM addon_purchase
+                     WHERE addon_id = %(addon_id)s
+                     AND user_id = %(user_id)s LIMIT 1;"""
+            self.cursor.execute(sql, {'addon_id': self.addon_id,
+                                      'user_id': self.user_id})
+            return self.cursor.fetchone()
+
+        return cached_lookup(purchase_key(self.addon_id, self.user_id),
+                             lookup)
 
     def check_purchase(self):
         """
         Verifies that the app has been purchased.
         """
-        sql = """SELECT id, type FROM addon_purchase
-                 WHERE addon_id = %(addon_id)s
-                 AND user_id = %(user_id)s LIMIT 1;"""
-        self.cursor.execute(sql, {'addon_id': self.addon_id,
-                                  'user_id': self.user_id})
-        result = self.cursor.fetchone()
+        result = self.get_purchase()
         if not result:
             log_info('Invalid receipt, no purchase')
             raise InvalidReceipt
@@ -277,6 +340,88 @@ class Verify:
         return json.dumps({'status': 'expired'})
 
 
+class BatchVerify:
+    """
+    Verifies a list of purchase receipts. The installs and then the
+    purchases for every receipt are looked up with one query each, instead
+    of two queries per receipt.
+    """
+
+    def __init__(self, receipts, environ):
+        self.verifiers = [Verify(receipt, environ) for receipt in receipts]
+        # This is so the unit tests can override the connection.
+        self.conn, self.cursor = None, None
+
+    def setup_db(self):
+        if not self.cursor:
+            self.conn = mypool.connect()
+            self.cursor = self.conn.cursor()
+
+    def get_installs(self, keys):
+        """
+        Returns {(addon_id, uuid): (id, user_id, premium_type)} for the
+        `keys` that have an install.
+        """
+        if not keys:
+            return {}
+        uuids = list(set(uuid for uuid, addon_id in keys))
+        sql = ('SELECT id, user_id, premium_type, addon_id, uuid '
+               'FROM users_install WHERE uuid IN (%s);'
+               % ', '.join(['%s'] * len(uuids)))
+        self.cursor.execute(sql, uuids)
+        return dict(((addon_id, uuid), (pk, user_id, premium))
+                    for pk, user_id, premium, addon_id, uuid
+                    in self.cursor.fetchall())
+
+    def get_purchases(self, keys):
+        """
+        Returns {(addon_id, user_id): (id, type)} for the `keys` that have
+        a purchase.
+        """
+        if not keys:
+            return {}
+        addons = list(set(addon_id for addon_id, user_id in keys))
+        users = list(set(user_id for addon_id, user_id in keys))
+        sql = ('SELECT id, type, addon_id, user_id FROM addon_purchase '
+               'WHERE addon_id IN (%s) AND user_id IN (%s);'
+               % (', '.join(['%s'] * len(addons)),
+                  ', '.join(['%s'] * len(users))))
+        self.cursor.execute(sql, addons + users)
+        keys = set(keys)
+        return dict(((addon_id, user_id), (pk, type_))
+                    for pk, type_, addon_id, user_id
+                    in self.cursor.fetchall()
+                    if (addon_id, user_id) in keys)
+
+    def check_full(self):
+        """
+        Runs `Verify.check_full` for each receipt and returns a JSON list of
+        the results, in the same order as the receipts.
+        """
+        keys = []
+        for verifier in self.verifiers:
+            try:
+                verifier.decoded = verifier.decode()
+                keys.append(verifier.get_install_key())
+            except InvalidReceipt:
+                verifier.decoded = None
+
+        self.setup_db()
+        installs = self.get_installs(keys)
+        purchases = self.get_purchases(
+            [(addon_id, user_id) for (addon_id, uuid), (pk, user_id, premium)
+             in installs.items() if premium == ADDON_PREMIUM])
+
+        results = []
+        for verifier in self.verifiers:
+            if verifier.decoded is None:
+                results.append(verifier.invalid())
+                continue
+            verifier.installs, verifier.purchases = installs, purchases
+            results.append(verifier.check_full())
+        return '[%s]' % ', '.join(results)
+
+
 def get_headers(length):
     return [('Access-Control-Allow-Origin', '*'),
             ('Access-Control-Allow-Methods', 'POST'),
@@ -286,15 +431,59 @@ def get_headers(length):
             ('Last-Modified', format_date_time(time()))]
 
 
+# Setting up the receipt verifier or loading the key is expensive, so they
+# are kept for WEBAPPS_RECEIPT_KEY_TIMEOUT seconds.
+key_cache = LRUCache(size=10,
+                     timeout=settings.WEBAPPS_RECEIPT_KEY_TIMEOUT)
+# Apps verify the same receipt over and over, so the decoded contents of
+# recently verified receipts are kept, keyed on a hash of the receipt.
+receipt_cache = LRUCache(size=settings.WEBAPPS_RECEIPT_CACHE_SIZE,
+                         timeout=settings.WEBAPPS_RECEIPT_CACHE_TIMEOUT)
+
+
+def get_verifier():
+    verifier = key_cache.get('verifier')
+    if verifier is None:
+        verifier = certs.ReceiptVerifier(valid_issuers=
+                                         settings.SIGNING_VALID_ISSUERS)
+        key_cache.set('verifier', verifier)
+    return verifier
+
+
+def get_key():
+    name = settings.WEBAPPS_RECEIPT_KEY
+    key = key_cache.get(('key', name))
+    if key is None:
+        key = jwt.rsa_load(name)
+        key_cache.set(('key', name), key)
+    return key
+
+
 def decode_receipt(receipt):
     """
     Cracks the receipt using the private key. This will probably change
     to using the cert at some point, especially when we get the HSM.
+
+    Receipts that decoded successfully are cached, a copy of the cached
+    contents is returned so that callers can alter it.
     """
+    if isinstance(receipt, unicode):
+        receipt = receipt.encode('utf-8')
+    hashed = hashlib.sha1(receipt).hexdigest()
+    raw = receipt_cache.get(hashed)
+    if raw is not None:
+        statsd.incr('services.decode.cached')
+        return copy.deepcopy(raw)
+
+    raw = _decode_receipt(receipt)
+    receipt_cache.set(hashed, raw)
+    return copy.deepcopy(raw)
+
+
+def _decode_receipt(receipt):
     with statsd.timer('services.decode'):
         if settings.SIGNING_SERVER_ACTIVE:
-            verifier = certs.ReceiptVerifier(valid_issuers=
-                                             settings.SIGNING_VALID_ISSUERS)
+            verifier = get_verifier()
             try:
                 result = verifier.verify(receipt)
             except ExpiredSignatureError:
@@ -304,8 +493,7 @@ def decode_receipt(receipt):
                 raise VerificationError()
             return jwt.decode(receipt.split('~')[1], verify=False)
         else:
-            key = jwt.rsa_load(settings.WEBAPPS_RECEIPT_KEY)
-            raw = jwt.decode(receipt, key)
+            raw = jwt.decode(receipt, get_key())
     return raw
 
 
@@ -337,11 +525,45 @@ def receipt_check(environ):
     return output
 
 
+BATCH_SUFFIX = 'batch/'
+
+
+def batch_receipt_check(environ):
+    """
+    Verifies a JSON list of receipts posted to `<verify url>batch/`, the
+    receipts themselves are checked against `<verify url>`.
+    """
+    with statsd.timer('services.verify.batch'):
+        try:
+            receipts = json.loads(environ['wsgi.input'].read())
+            assert isinstance(receipts, list)
+            assert all(isinstance(r, basestring) for r in receipts)
+        except (AssertionError, ValueError):
+            log_info('Invalid batch of receipts')
+            return 400, ''
+
+        if len(receipts) > settings.WEBAPPS_RECEIPT_BATCH_SIZE:
+            log_info('Too many receipts in batch: %s' % len(receipts))
+            return 400, ''
+
+        environ = dict(environ)
+        environ['PATH_INFO'] = environ['PATH_INFO'][:-len(BATCH_SUFFIX)]
+        statsd.incr('services.verify.batch.receipts', len(receipts))
+        try:
+            return 200, BatchVerify(receipts, environ).check_full()
+        except:
+            log_exception('<batch>')
+            return 500, ''
+
+
 def application(environ, start_response):
     body = ''
     path = environ.get('PATH_INFO', '')
     if path == '/services/status/':
         status, body = status_check(environ)
+    elif environ.get('REQUEST_METHOD') == 'POST' and path.endswith(
+            BATCH_SUFFIX):
+        status, body = batch_receipt_check(environ)
     else:
         # Only allow POST through as per spec.
         if environ.get('REQUEST_METHOD') != 'POST':
@@ -76,6 +76,9 @@ CACHES = {
 # No more failures!
 APP_PREVIEW = False
 
+# Index saved apps straight away.
+ES_INDEX_QUEUE_DELAY = 0
+
 # Overrides whatever storage you might have put in local settings.
 DEFAULT_FILE_STORAGE = 'amo.utils.LocalFileStorage'
 
@@ -128,3 +131,9 @@ SQL_RESET_SEQUENCES = False
 GEOIP_URL = ''
 GEOIP_DEFAULT_VAL = 'worldwide'
 GEOIP_DEFAULT_TIMEOUT = .2
+GEOIP_PATH = ''
+
+MONOLITH_BUFFER_SIZE = 0
+
+# Fixtures change between tests without saving prices.
+PRICE_TABLE_CHECK_INTERVAL = 0